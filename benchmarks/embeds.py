@@ -0,0 +1,54 @@
+"""
+Measure how long uwuifying a full-size embed takes.
+
+Compares the old conversion, which round-trips the embed through a dict and runs the
+whole pipeline once per title, description, footer and field, with the batched one,
+which scans every segment in a single pass and patches a copy of the embed.
+
+Usage:
+    python -m benchmarks.embeds --repeat 200
+"""
+import argparse
+import statistics
+import time
+from functools import partial
+
+from discord import Embed
+
+from cogs.uwu import convert_embed
+from tests.embeds import legacy_convert, many_fields_embed, max_size_embed
+from utils.rng import RandomStream
+from utils.uwu import EmojiIndex, UwuTransformer
+
+
+def measure(convert, embed: Embed, repeat: int) -> dict[str, float]:
+    """Convert `embed` `repeat` times with a seeded RNG stream, and return the median and best times."""
+    rng = RandomStream(0)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        convert(embed, rng)
+        timings.append(time.perf_counter() - started)
+    return {"median": statistics.median(timings), "best": min(timings)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="How many times to convert each embed.")
+    args = parser.parse_args()
+
+    transformer = UwuTransformer(EmojiIndex())
+    converters = (
+        ("per-field", lambda embed, rng: legacy_convert(partial(transformer.uwuify, rng=rng), embed)),
+        ("batched", lambda embed, rng: convert_embed(partial(transformer.uwuify_many, rng=rng), embed)),
+    )
+
+    for shape, embed in (("max size", max_size_embed()), ("25 short fields", many_fields_embed())):
+        print(f"{shape} ({len(embed)} characters)")
+        for name, convert in converters:
+            result = measure(convert, embed, args.repeat)
+            print(f"  {name:>9}: median {result['median'] * 1000:7.3f}ms   best {result['best'] * 1000:7.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+A stand-in for Battle.net, so the Wow cog can be load tested without going anywhere near Blizzard.
+
+Serves just enough for `!show_character` and friends: OAuth tokens, character profile
+and media summaries, and the renders the media summaries point at. Every character
+exists, except ones whose name starts with "missing", which 404 like an unknown
+character would. Renders are drawn once when the server starts, and each character's
+copy has their name written into its metadata, so every character's renders are
+different files, with their own ETag to be revalidated with.
+
+Every request waits for `latency` seconds, give or take `jitter`. API requests can also
+be made to fail with a 503 some of the time, or to be throttled with a 429, either at
+random or once they go over a quota. Renders come from the CDN, which is never throttled.
+Counts of every response are served as JSON from `/_stats`.
+
+The server runs in a process of its own, so drawing renders and answering requests
+never competes with the bot being measured.
+
+Usage:
+    python -m benchmarks.fake_battlenet --port 8080 --latency 0.05 --error-rate 0.01
+
+and point the bot at it with BNET_BASE_URL=http://localhost:8080.
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import multiprocessing
+import struct
+import zlib
+import random
+import time
+from collections import Counter
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from aiohttp import web
+from PIL import Image, ImageChops, ImageDraw
+
+from constants.warcraft import SPECS
+from utils.ratelimit import TokenBucket
+
+# The renders every character has, in the order Battle.net lists them, and their sizes.
+# Real full renders are large lossless PNGs, so the fake ones are too.
+RENDERS = {
+    "avatar": ((84, 84), "jpg"),
+    "inset": ((230, 116), "jpg"),
+    "main": ((1000, 667), "png"),
+    "main-raw": ((1600, 1600), "png"),
+}
+
+RACES = ("Human", "Dwarf", "Night Elf", "Orc", "Tauren", "Blood Elf", "Dark Iron Dwarf", "Vulpera")
+GENDERS = ("Male", "Female")
+
+
+@dataclass
+class FakeBattleNetConfig:
+    """How the fake Battle.net behaves."""
+
+    latency: float = 0.05  # Seconds every request takes
+    jitter: float = 0.02  # Give or take this many seconds
+    error_rate: float = 0.0  # Chance an API request fails with a 503
+    throttle_rate: float = 0.0  # Chance an API request is throttled with a 429
+    quota: float | None = None  # API requests per second before everything's throttled
+    retry_after: float = 1  # What throttled requests are told to wait, in seconds
+
+
+def _seed(name: str) -> int:
+    return int.from_bytes(hashlib.sha256(name.lower().encode()).digest()[:8], "big")
+
+
+def character_profile(realm: str, name: str) -> dict:
+    """Make up a profile summary for a character, the same one every time."""
+    rng = random.Random(_seed(name))
+    spec = rng.choice(SPECS)
+    return {
+        "name": name.title(),
+        "realm": {"slug": realm},
+        "level": 70,
+        "gender": {"name": rng.choice(GENDERS)},
+        "race": {"name": rng.choice(RACES)},
+        "character_class": {"name": spec.class_name},
+        "active_spec": {"name": spec.spec_name},
+        "equipped_item_level": rng.randint(400, 500),
+    }
+
+
+def draw_render(kind: str) -> bytes:
+    """Draw a render: a blotchy figure on a transparent background, which compresses about as well as a real one."""
+    (width, height), extension = RENDERS[kind]
+    noise = Image.effect_noise((width // 2, height // 2), 48).resize((width, height), Image.BICUBIC)
+    figure = ImageChops.multiply(Image.new("RGB", (width, height), (200, 150, 90)), noise.convert("RGB"))
+
+    buffer = io.BytesIO()
+    if extension == "jpg":
+        figure.save(buffer, "JPEG", quality=90)
+    else:
+        mask = Image.new("L", (width, height), 0)
+        ImageDraw.Draw(mask).ellipse((width // 5, height // 10, width * 4 // 5, height * 19 // 20), fill=255)
+        render = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        render.paste(figure, mask=mask)
+        render.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def tag_render(data: bytes, extension: str, name: str) -> bytes:
+    """Write a character's name into a render's metadata, making it a file of their own without redrawing it."""
+    text = f"Comment\0{name}".encode()
+    if extension == "jpg":
+        # A comment segment, right after the start of image marker
+        return data[:2] + b"\xff\xfe" + struct.pack(">H", len(text) + 2) + text + data[2:]
+    # A text chunk, right after the header chunk, which is 33 bytes in including the signature
+    chunk = struct.pack(">I", len(text)) + b"tEXt" + text + struct.pack(">I", zlib.crc32(b"tEXt" + text))
+    return data[:33] + chunk + data[33:]
+
+
+class FakeBattleNet:
+    """The request handlers, and the state they share."""
+
+    def __init__(self, config: FakeBattleNetConfig):
+        self.config = config
+        self.responses: Counter[str] = Counter()
+        self.quota = TokenBucket(config.quota, config.quota) if config.quota else None
+        self.renders = {kind: draw_render(kind) for kind in RENDERS}
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        app.add_routes([
+            web.post("/oauth/token", self.token),
+            web.get("/profile/wow/character/{realm}/{name}", self.profile),
+            web.get("/profile/wow/character/{realm}/{name}/character-media", self.media),
+            web.get("/renders/{realm}/{name}/{kind}.{extension}", self.render),
+            web.get("/_stats", self.stats),
+        ])
+        return app
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        """Add latency to every request, fail and throttle API requests as configured, and count what we answered."""
+        if request.path == "/_stats":
+            return await handler(request)
+
+        kind = "cdn" if request.path.startswith("/renders/") else "api"
+        await asyncio.sleep(max(0.0, self.config.latency + random.uniform(-self.config.jitter, self.config.jitter)))
+        try:
+            if kind == "api":
+                if (self.quota is not None and not self.quota.try_acquire()) or random.random() < self.config.throttle_rate:
+                    raise web.HTTPTooManyRequests(headers={"Retry-After": str(self.config.retry_after)})
+                if random.random() < self.config.error_rate:
+                    raise web.HTTPServiceUnavailable()
+            response = await handler(request)
+        except web.HTTPException as error:
+            self.responses[f"{kind} {error.status}"] += 1
+            raise
+        self.responses[f"{kind} {response.status}"] += 1
+        return response
+
+    async def token(self, request: web.Request) -> web.Response:
+        return web.json_response({"access_token": f"fake-{time.time_ns()}", "token_type": "bearer", "expires_in": 86399})
+
+    def _character(self, request: web.Request) -> tuple[str, str]:
+        realm, name = request.match_info["realm"], request.match_info["name"]
+        if name.lower().startswith("missing"):
+            raise web.HTTPNotFound()
+        return realm, name
+
+    async def profile(self, request: web.Request) -> web.Response:
+        return web.json_response(character_profile(*self._character(request)))
+
+    async def media(self, request: web.Request) -> web.Response:
+        realm, name = self._character(request)
+        base = f"{request.scheme}://{request.host}/renders/{realm}/{name.lower()}"
+        assets = [{"key": kind, "value": f"{base}/{kind}.{extension}"} for kind, (_, extension) in RENDERS.items()]
+        return web.json_response({"assets": assets})
+
+    async def render(self, request: web.Request) -> web.Response:
+        _, name = self._character(request)
+        kind = request.match_info["kind"]
+        if kind not in RENDERS:
+            raise web.HTTPNotFound()
+
+        extension = RENDERS[kind][1]
+        etag = f'"{kind}-{_seed(name):x}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+
+        data = tag_render(self.renders[kind], extension, name)
+        content_type = "image/jpeg" if extension == "jpg" else "image/png"
+        return web.Response(body=data, content_type=content_type, headers={"ETag": etag})
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.responses))
+
+
+async def _serve(config: FakeBattleNetConfig, host: str, port: int, ready=None) -> None:
+    runner = web.AppRunner(FakeBattleNet(config).app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    if ready is not None:
+        ready.send(port)
+    else:
+        print(f"Fake Battle.net listening on http://{host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def _run(config: FakeBattleNetConfig, host: str, port: int, ready) -> None:
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(_serve(config, host, port, ready))
+
+
+@contextlib.contextmanager
+def running(config: FakeBattleNetConfig, host: str = "127.0.0.1") -> Iterator[str]:
+    """Run a fake Battle.net in a process of its own on a free port, and yield its base URL."""
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run, args=(config, host, 0, sender), daemon=True)
+    process.start()
+    try:
+        if not receiver.poll(30):
+            raise RuntimeError("The fake Battle.net didn't start in time.")
+        yield f"http://{host}:{receiver.recv()}"
+    finally:
+        process.terminate()
+        process.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds every request takes.")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Give or take this many seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Chance an API request fails with a 503.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Chance an API request is throttled with a 429.")
+    parser.add_argument("--quota", type=float, default=None, help="API requests per second before everything's throttled.")
+    parser.add_argument("--retry-after", type=float, default=1, help="What throttled requests are told to wait, in seconds.")
+    args = parser.parse_args()
+
+    config = FakeBattleNetConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        quota=args.quota,
+        retry_after=args.retry_after,
+    )
+    _run(config, args.host, args.port, None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Stand-ins for the bits of discord.py the benchmarks need, so nothing has to connect to Discord."""
+import asyncio
+
+
+class FakeBot:
+    """Stands in for the Bot, which the cogs only need for its (empty) emoji list, and to hang resources off."""
+
+    emojis = ()
+
+    def get_user(self, user_id: int) -> None:
+        return None
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+
+
+class FakeMessage:
+    """Stands in for a discord Message, with a fixed round trip for every edit."""
+
+    def __init__(self, latency: float = 0.0, content: str | None = None):
+        self.latency = latency
+        self.content = content
+        self.reference = None
+        self.mentions = ()
+        self.role_mentions = ()
+
+    async def edit(self, content: str) -> None:
+        await asyncio.sleep(self.latency)
+        self.content = content
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+
+
+class FakeContext:
+    """
+    Stands in for a commands.Context in a DM, with a fixed round trip for every send.
+
+    Everything sent is kept in `sent`, so a benchmark can check what the command replied with.
+    """
+
+    def __init__(self, channel_id: int = 0, latency: float = 0.0, author_id: int = 0, bot: FakeBot | None = None):
+        self.channel = FakeChannel(channel_id)
+        self.author = FakeUser(author_id)
+        self.latency = latency
+        self.bot = bot or FakeBot()
+        self.guild = None
+        self.message = FakeMessage(latency)
+        self.sent: list[FakeMessage] = []
+
+    async def send(self, content: str | None = None, **kwargs) -> FakeMessage:
+        await asyncio.sleep(self.latency)
+        message = FakeMessage(self.latency, content)
+        self.sent.append(message)
+        return message
@@ -0,0 +1,252 @@
+"""
+Load test `!show_character`, `!new_main` and `!uwu` against a fake Battle.net and a fake Discord.
+
+Starts the fake Battle.net from `benchmarks/fake_battlenet.py` in a process of its own,
+loads the Wow and Uwu cogs the way the bot does, pointed at it, and replays thousands
+of invocations with a fixed number in flight at once. Characters are picked with a
+long tail, a few popular ones and lots of rarely seen ones, so the caches see something
+like real traffic. Renders go through a fresh disk cache each run.
+
+Reports throughput, latency percentiles and failures for each command, how late the
+event loop woke up a timer while all that was going on, and what the fake Battle.net,
+the request scheduler, the caches and the worker pools saw.
+
+Usage:
+    python -m benchmarks.load --invocations 2000 --concurrency 200
+    python -m benchmarks.load --mix show_character=1 --error-rate 0.05 --throttle-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import traceback
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+import aiohttp
+
+from benchmarks.fake_battlenet import RENDERS, FakeBattleNetConfig, running
+from benchmarks.fakes import FakeBot, FakeContext
+from cogs.uwu import Uwu
+from cogs.wow import IMAGE_CACHE_FRESH_FOR, IMAGE_CACHE_MAX_BYTES, Wow
+from tests.embeds import sample_text
+from utils.disk_cache import DiskCache
+from utils.resources import get_resources
+
+COMMANDS = ("show_character", "new_main", "uwu")
+
+# The text `!uwu` is given, from a quick reply to a wall of text
+UWU_TEXTS = (sample_text(20), sample_text(400), sample_text(2000))
+
+NEW_MAIN_QUERIES = ("ALL", "tank", "healer dps", "dps -mage", "holy")
+
+
+@dataclass
+class Invocation:
+    """A single command to run, and what it's run with."""
+
+    command: str
+    args: tuple
+    kwargs: dict = field(default_factory=dict)
+
+
+@dataclass
+class Result:
+    """How a single invocation went."""
+
+    command: str
+    seconds: float
+    failure: str | None = None  # Why it failed, e.g. the exception it raised, if it did
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    """Parse a command mix like "show_character=2,uwu=1" into weights."""
+    mix = {}
+    for part in filter(None, value.split(",")):
+        command, _, weight = part.partition("=")
+        if command not in COMMANDS:
+            raise argparse.ArgumentTypeError(f"Unknown command '{command}', expected some of {', '.join(COMMANDS)}.")
+        mix[command] = float(weight or 1)
+    return mix
+
+
+def workload(count: int, mix: dict[str, float], characters: int, missing_rate: float, rng: random.Random) -> list[Invocation]:
+    """Make up `count` invocations, mixed as asked."""
+    names = [f"missing{i}" if rng.random() < missing_rate else f"char{i}" for i in range(characters)]
+    # Zipf-ish, so a few characters are looked up a lot and most only now and then
+    popularity = [1 / (rank + 1) for rank in range(characters)]
+
+    invocations = []
+    for command in rng.choices(list(mix), weights=list(mix.values()), k=count):
+        if command == "show_character":
+            name = rng.choices(names, weights=popularity)[0]
+            invocations.append(Invocation(command, (name, "argent-dawn", rng.choice(list(RENDERS)))))
+        elif command == "new_main":
+            invocations.append(Invocation(command, (), {"class_type": rng.choice(NEW_MAIN_QUERIES)}))
+        else:
+            invocations.append(Invocation(command, (), {"text": rng.choice(UWU_TEXTS)}))
+    return invocations
+
+
+async def load_cogs(bot: FakeBot, cache_dir: str) -> dict[str, object]:
+    """Load the cogs the way the bot does, with a disk cache that starts out empty."""
+    get_resources(bot).get(
+        "wow.image_cache",
+        lambda: DiskCache(cache_dir, max_bytes=IMAGE_CACHE_MAX_BYTES, fresh_for=IMAGE_CACHE_FRESH_FOR),
+    )
+    cogs = {"wow": Wow(bot), "uwu": Uwu(bot)}
+    for cog in cogs.values():
+        await cog.cog_load()
+    return cogs
+
+
+async def invoke(cogs: dict[str, object], invocation: Invocation, ctx: FakeContext) -> Result:
+    """Run a single command, and time it."""
+    if invocation.command == "uwu":
+        cog, command = cogs["uwu"], Uwu.uwu_command
+    else:
+        cog, command = cogs["wow"], getattr(Wow, invocation.command)
+
+    started = time.perf_counter()
+    failure = None
+    try:
+        await command.callback(cog, ctx, *invocation.args, **invocation.kwargs)
+    except Exception as error:
+        failure = type(error).__name__
+        if not isinstance(error, aiohttp.ClientResponseError):
+            traceback.print_exc()
+    else:
+        # Commands tell people about what went wrong, rather than raising
+        replies = [message.content for message in ctx.sent if message.content]
+        if any(reply.startswith("❌") for reply in replies):
+            failure = next(reply for reply in replies if reply.startswith("❌"))
+    return Result(invocation.command, time.perf_counter() - started, failure)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(args: argparse.Namespace, base_url: str) -> None:
+    os.environ["BNET_BASE_URL"] = base_url
+    os.environ.setdefault("BNET_CLIENT_ID", "load-test")
+    os.environ.setdefault("BNET_CLIENT_SECRET", "load-test")
+
+    rng = random.Random(args.seed)
+    invocations = workload(args.invocations, args.mix, args.characters, args.missing_rate, rng)
+    bot = FakeBot()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cogs = await load_cogs(bot, cache_dir)
+        queue = asyncio.Queue()
+        for i, invocation in enumerate(invocations):
+            queue.put_nowait((i, invocation))
+        results: list[Result] = []
+        lag = []
+        done = asyncio.Event()
+
+        async def sample():
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(args.interval)
+                lag.append(time.perf_counter() - started - args.interval)
+
+        async def worker():
+            while not queue.empty():
+                i, invocation = queue.get_nowait()
+                ctx = FakeContext(i % args.channels, args.discord_latency, author_id=i % args.users, bot=bot)
+                results.append(await invoke(cogs, invocation, ctx))
+
+        sampler = asyncio.create_task(sample())
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await sampler
+
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{base_url}/_stats") as response:
+                upstream = await response.json()
+
+        report(args, results, elapsed, lag, upstream, cogs)
+        await get_resources(bot).close()
+
+
+def report(args, results: list[Result], elapsed: float, lag: list[float], upstream: dict, cogs: dict) -> None:
+    """Print what happened."""
+    print(f"{len(results)} invocations, {args.concurrency} at once, in {elapsed:.1f}s: {len(results) / elapsed:.1f}/s\n")
+    print(f"{'command':>16} {'count':>6} {'failed':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+
+    by_command = defaultdict(list)
+    for result in results:
+        by_command[result.command].append(result)
+    by_command["all"] = results
+    for command, group in by_command.items():
+        seconds = sorted(result.seconds for result in group)
+        failed = sum(result.failure is not None for result in group)
+        print(
+            f"{command:>16} {len(group):>6} {failed:>6} "
+            + " ".join(f"{percentile(seconds, q) * 1000:7.1f}ms" for q in (0.5, 0.95, 0.99, 1.0))
+        )
+
+    failures = Counter(result.failure for result in results if result.failure)
+    if failures:
+        print("\nfailures")
+        for failure, count in failures.most_common():
+            print(f"  {count:>6}  {failure}")
+
+    lag.sort()
+    print(
+        f"\nevent loop lag   p50 {statistics.median(lag) * 1000:.1f}ms   "
+        f"p99 {percentile(lag, 0.99) * 1000:.1f}ms   max {lag[-1] * 1000:.1f}ms"
+    )
+
+    wow, uwu = cogs["wow"], cogs["uwu"]
+    print(f"fake battle.net  {json.dumps(upstream, sort_keys=True)}")
+    print(f"scheduler        {wow.battlenet.scheduler.stats.as_dict()}")
+    print(f"lookup cache     {wow.battlenet.cache.stats.as_dict()}")
+    print(f"image cache      {wow.image_cache.stats.as_dict()}")
+    if "wow.upload_pool" in wow.resources:
+        print(f"upload workers   {wow.upload_pool.stats.as_dict()}")
+    print(f"uwu workers      {uwu.pool.stats.as_dict()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--invocations", type=int, default=2000, help="How many commands to run.")
+    parser.add_argument("--concurrency", type=int, default=200, help="How many to have in flight at once.")
+    parser.add_argument("--mix", type=parse_mix, default="show_character=1,new_main=1,uwu=1", help="Commands to run, and their weights.")
+    parser.add_argument("--characters", type=int, default=500, help="How many different characters to look up.")
+    parser.add_argument("--missing-rate", type=float, default=0.02, help="Share of characters that don't exist.")
+    parser.add_argument("--users", type=int, default=1000, help="How many different people to spread the commands over.")
+    parser.add_argument("--channels", type=int, default=50, help="How many channels to spread the commands over.")
+    parser.add_argument("--discord-latency", type=float, default=0.05, help="Simulated Discord round trip, in seconds.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated Battle.net round trip, in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Give or take this many seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Chance a Battle.net request fails with a 503.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Chance a Battle.net request is throttled with a 429.")
+    parser.add_argument("--quota", type=float, default=None, help="Battle.net requests per second before everything's throttled.")
+    parser.add_argument("--retry-after", type=float, default=1, help="What throttled requests are told to wait, in seconds.")
+    parser.add_argument("--interval", type=float, default=0.01, help="Event loop lag sampling interval, in seconds.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = FakeBattleNetConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        quota=args.quota,
+        retry_after=args.retry_after,
+    )
+    random.seed(args.seed)
+    with running(config) as base_url:
+        asyncio.run(run(args, base_url))
+
+
+if __name__ == "__main__":
+    main()
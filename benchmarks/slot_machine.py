@@ -0,0 +1,89 @@
+"""
+Measure how much `!new_main` rolls stall the event loop.
+
+Runs N concurrent rolls against a fake Discord context, once with the old blocking
+`time.sleep()` animation and once with the cog's async one, while sampling how late
+the event loop wakes up a timer. No Discord connection is needed.
+
+Usage:
+    python -m benchmarks.slot_machine --rolls 50
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from benchmarks.fakes import FakeBot, FakeContext
+from cogs.wow import Wow
+from constants.warcraft import SPECS
+from utils.rng import RandomStream
+
+
+async def legacy_roll(cog: Wow, ctx: FakeContext) -> None:
+    """The roll loop as it was before, blocking the event loop between frames."""
+    message = None
+    rng = RandomStream(random.getrandbits(32))
+    rolls = random.randint(3, 6)
+    for i in range(rolls):
+        new_class = await cog._get_random_class_spec(SPECS, rng)
+        time.sleep(0.075 * (i / 1.85))
+        if i == 0:
+            message = await ctx.send(content=f"🎲 {new_class}")
+        else:
+            await message.edit(content=f"🎲 {new_class}")
+
+
+async def current_roll(cog: Wow, ctx: FakeContext) -> None:
+    """The roll loop as the cog runs it now."""
+    await Wow.new_main.callback(cog, ctx, class_type="ALL")
+
+
+async def measure(roll, rolls: int, channels: int, latency: float, interval: float) -> dict[str, float]:
+    """Run `rolls` concurrent rolls, sampling event loop lag every `interval` seconds."""
+    cog = Wow(bot=FakeBot())
+    lag = []
+    done = asyncio.Event()
+
+    async def sample():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag.append(time.perf_counter() - started - interval)
+
+    sampler = asyncio.create_task(sample())
+    started = time.perf_counter()
+    await asyncio.gather(*(roll(cog, FakeContext(i % channels, latency)) for i in range(rolls)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await sampler
+
+    lag.sort()
+    return {
+        "wall": elapsed,
+        "lag_p50": statistics.median(lag),
+        "lag_p99": lag[int(len(lag) * 0.99) - 1] if len(lag) > 1 else lag[-1],
+        "lag_max": lag[-1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rolls", type=int, default=50, help="How many rolls to run at once.")
+    parser.add_argument("--channels", type=int, default=10, help="How many channels to spread them over.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated Discord round trip, in seconds.")
+    parser.add_argument("--interval", type=float, default=0.01, help="Event loop lag sampling interval, in seconds.")
+    args = parser.parse_args()
+
+    for name, roll in (("blocking", legacy_roll), ("async", current_roll)):
+        random.seed(0)
+        result = asyncio.run(measure(roll, args.rolls, args.channels, args.latency, args.interval))
+        print(
+            f"{name:>8}: wall {result['wall'] * 1000:8.1f}ms   loop lag "
+            f"p50 {result['lag_p50'] * 1000:7.1f}ms   p99 {result['lag_p99'] * 1000:7.1f}ms   "
+            f"max {result['lag_max'] * 1000:7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Time the uwu pipeline and the `!new_main` selector, and compare them against a stored baseline.
+
+Covers `Uwu._uwuify` on short, medium and huge messages, each uwuify stage on its own,
+`Uwu._convert_embed` on a max-size embed, and the `!new_main` class filter on a matrix
+of queries. Every case reports ops/s, latency percentiles, and the peak memory it
+allocates per call according to tracemalloc. No Discord connection is needed.
+
+Timings are compared against `benchmarks/baseline.json`, and anything that got slower
+or hungrier than the tolerance allows is flagged. Refresh the baseline with
+`--save-baseline` when a change is expected to move the numbers.
+
+Usage:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --only uwuify --check
+    python -m benchmarks.suite --save-baseline
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+
+from benchmarks.fakes import FakeBot
+from cogs.uwu import Uwu
+from tests.embeds import many_fields_embed, max_size_embed, sample_text
+from utils import class_filter
+from utils.rng import RandomStream
+
+BASELINE = Path(__file__).parent / "baseline.json"
+
+MESSAGES = {
+    "short": "Hello, my name is John!",
+    "medium": sample_text(400) + " <:blobwave:123456789012345678>",
+    "huge": sample_text(4000),
+}
+
+QUERIES = (
+    "all",
+    "tank",
+    "healer dps",
+    "dps -mage",
+    "healer, death knight",
+    "holy",
+    "beast mastery hunter -tank",
+    "-warrior -paladin -death knight -demon hunter",
+)
+
+
+@dataclass
+class Case:
+    """A single thing to time."""
+
+    name: str
+    func: Callable[[], object]
+
+
+def build_cases() -> list[Case]:
+    """Build every benchmark case, each with its own seeded RNG stream."""
+    cog = Uwu(FakeBot())
+    transformer = cog.transformer
+    cases = []
+
+    for size, message in MESSAGES.items():
+        cases.append(Case(f"uwuify/{size}", partial(cog._uwuify, message, rng=RandomStream(0))))
+
+    # The stages see the text as it is after the earlier ones, lowercased and word replaced
+    medium = transformer._word_replace(MESSAGES["medium"].lower())
+    cases += [
+        Case("stage/word_replace", partial(transformer._word_replace, MESSAGES["medium"].lower())),
+        Case("stage/nyaify", partial(transformer._nyaify, medium)),
+        Case("stage/char_replace", partial(transformer._char_replace, medium)),
+        Case("stage/stutter", partial(transformer._stutter, 0.2, medium, RandomStream(0))),
+        Case("stage/emoji", partial(transformer._emoji, 0.25, medium, RandomStream(0))),
+        Case("stage/ext_emoji_replace", partial(transformer._ext_emoji_replace, medium, RandomStream(0))),
+    ]
+
+    for shape, embed in (("max_size", max_size_embed()), ("many_fields", many_fields_embed())):
+        convert = partial(transformer.uwuify_many, rng=RandomStream(0))
+        cases.append(Case(f"convert_embed/{shape}", partial(cog._convert_embed, convert, embed)))
+
+    for query in QUERIES:
+        cases.append(Case(f"new_main_filter/{query}", partial(select_uncached, query)))
+    cases.append(Case("new_main_filter/cached", partial(class_filter.select_specs, "dps -mage")))
+
+    return cases
+
+
+def select_uncached(query: str) -> None:
+    """Run the class filter without its memoization, so we time the actual parsing."""
+    class_filter._select.cache_clear()
+    class_filter.select_specs(query)
+
+
+def time_case(case: Case, min_time: float, min_runs: int) -> dict[str, float]:
+    """Call the case for at least `min_time` seconds and `min_runs` runs, timing every call."""
+    case.func()  # Warm up
+
+    timings = []
+    deadline = time.perf_counter() + min_time
+    while len(timings) < min_runs or time.perf_counter() < deadline:
+        started = time.perf_counter()
+        case.func()
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    return {
+        "ops_per_sec": len(timings) / sum(timings),
+        "p50_us": percentile(timings, 50) * 1e6,
+        "p95_us": percentile(timings, 95) * 1e6,
+        "p99_us": percentile(timings, 99) * 1e6,
+    }
+
+
+def measure_allocations(case: Case, runs: int = 20) -> dict[str, float]:
+    """Return the median peak memory, in KiB, that a single call to the case allocates."""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(runs):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            case.func()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+    return {"peak_kib": statistics.median(peaks) / 1024}
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    """The value below which `percent` percent of the sorted values fall."""
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[index]
+
+
+def compare(result: dict[str, float], baseline: dict[str, float] | None, tolerance: float) -> tuple[str, bool]:
+    """Describe how a result compares to its baseline, and whether it's a regression."""
+    if baseline is None:
+        return "new", False
+
+    speed = result["ops_per_sec"] / baseline["ops_per_sec"] - 1
+    memory = (result["peak_kib"] + 1) / (baseline["peak_kib"] + 1) - 1
+    regressed = speed < -tolerance or memory > tolerance
+
+    note = f"{speed:+6.0%} ops/s {memory:+6.0%} mem"
+    if regressed:
+        note += "   REGRESSION"
+    return note, regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default="", help="Only run cases whose name contains this.")
+    parser.add_argument("--time", type=float, default=0.5, help="Minimum seconds to spend timing each case.")
+    parser.add_argument("--runs", type=int, default=50, help="Minimum number of timed calls per case.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="How much worse than the baseline is allowed.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE, help="The baseline file to compare against.")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with these results.")
+    parser.add_argument("--check", action="store_true", help="Exit with an error if anything regressed.")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    results = {}
+    regressions = []
+
+    print(f"{'case':<60} {'ops/s':>10} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} {'peak KiB':>9}")
+    for case in build_cases():
+        if args.only not in case.name:
+            continue
+
+        result = time_case(case, args.time, args.runs) | measure_allocations(case)
+        results[case.name] = result
+        note, regressed = compare(result, baseline.get(case.name), args.tolerance)
+        if regressed:
+            regressions.append(case.name)
+
+        print(
+            f"{case.name:<60} {result['ops_per_sec']:>10.0f} {result['p50_us']:>9.1f} "
+            f"{result['p95_us']:>9.1f} {result['p99_us']:>9.1f} {result['peak_kib']:>9.1f}   {note}"
+        )
+
+    if args.save_baseline:
+        # Keep the baseline for any cases we skipped this time
+        baseline.update({name: {key: round(value, 3) for key, value in result.items()} for name, result in results.items()})
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"Saved {len(results)} results to {args.baseline}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import asyncio
+import os
+
+from discord.ext import commands
+from discord.ext.commands import Cog, Bot, Context
+
+from utils.reloader import Reloader, ReloadError
+
+# If this is set, the cogs and constant tables are checked for changes every this many
+# seconds, and reloaded as soon as they change. Handy while working on the bot.
+RELOAD_WATCH_INTERVAL = float(os.environ.get("RELOAD_WATCH_INTERVAL", 0))
+
+
+class Reload(Cog):
+    """Reloads cogs and constant tables without restarting the bot."""
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        # Reloading this cog would cancel the very command or watcher doing the reloading
+        self.reloader = Reloader(bot, exclude={__name__})
+        self._watch_task: asyncio.Task | None = None
+
+    async def cog_load(self) -> None:
+        """Start watching for changes, if we've been asked to."""
+        if RELOAD_WATCH_INTERVAL > 0:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def cog_unload(self) -> None:
+        """Stop watching for changes."""
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+
+    async def _watch(self) -> None:
+        """Reload whatever's changed on disk, over and over."""
+        while True:
+            await asyncio.sleep(RELOAD_WATCH_INTERVAL)
+            changed = self.reloader.changed()
+            if not changed:
+                continue
+            try:
+                await self.reloader.reload(changed)
+            except ReloadError:
+                pass  # Already logged, and we'll try again once the files change again
+
+    @commands.command()
+    @commands.is_owner()
+    async def reload(self, ctx: Context, *names: str):
+        """
+        Reload whatever's changed on disk, or just the given cogs and modules, without restarting the bot.
+
+        Anything built on what's reloaded is reloaded too, e.g. reloading
+        constants.warcraft also reloads the class filter and the wow cog.
+
+        Example:
+        '!reload' reloads everything that's changed
+        '!reload wow constants.warcraft' reloads the wow cog and the spec tables
+        """
+        if names:
+            targets = {name if "." in name else f"cogs.{name}" for name in names}
+        else:
+            targets = self.reloader.changed()
+            if not targets:
+                return await ctx.send("Nothing's changed since it was loaded.")
+
+        try:
+            reloaded = await self.reloader.reload(targets)
+        except ReloadError as error:
+            return await ctx.send(f"❌ {error}")
+        await ctx.send(f"✅ Reloaded {', '.join(reloaded)}.")
+
+
+async def setup(bot: Bot) -> None:
+    """Load the reload cog."""
+    await bot.add_cog(Reload(bot))
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import os
+import time
+import typing as t
+
+from discord.ext import commands
+from discord.ext.commands import Cog, Bot, Context
+
+from utils.memory import memory_report
+from utils.metrics import COMMAND_LATENCY, LOOP_LAG, REGISTRY
+
+if t.TYPE_CHECKING:
+    from aiohttp import web
+
+log = logging.getLogger(__name__)
+
+# If this is set, the metrics are also served in Prometheus' text format at
+# http://127.0.0.1:<METRICS_PORT>/metrics. They're only ever served on localhost.
+METRICS_PORT = os.environ.get("METRICS_PORT")
+METRICS_HOST = "127.0.0.1"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# How often to check how late the event loop is running.
+LOOP_LAG_INTERVAL = 0.5
+
+# Discord won't let us send more than this in a single message.
+MAX_MESSAGE_LENGTH = 2000
+
+
+class Stats(Cog):
+    """Times every command, samples event loop lag, and shows it all off."""
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self._invoked_at: dict[int, float] = {}
+        self._lag_task: asyncio.Task | None = None
+        self._runner: "web.AppRunner | None" = None
+
+    async def cog_load(self) -> None:
+        """Start sampling event loop lag and serving metrics."""
+        self._lag_task = asyncio.create_task(self._sample_loop_lag())
+
+        if METRICS_PORT:
+            # aiohttp's server side is slow to import, so we only do it if we're serving
+            from aiohttp import web
+
+            app = web.Application()
+            app.router.add_get("/metrics", self._serve_metrics)
+            self._runner = web.AppRunner(app)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, METRICS_HOST, int(METRICS_PORT)).start()
+
+    async def cog_unload(self) -> None:
+        """Stop sampling and serving."""
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    @Cog.listener()
+    async def on_command(self, ctx: Context) -> None:
+        self._invoked_at[id(ctx)] = time.perf_counter()
+
+    @Cog.listener()
+    async def on_command_completion(self, ctx: Context) -> None:
+        self._observe(ctx, "ok")
+
+    @Cog.listener()
+    async def on_command_error(self, ctx: Context, error: commands.CommandError) -> None:
+        self._observe(ctx, "error")
+
+        # Listening for errors turns off discord.py's own logging of them, so we do it instead
+        if ctx.command is not None and ctx.command.has_error_handler():
+            return
+        if ctx.cog is not None and ctx.cog.has_error_handler():
+            return
+        log.error("Ignoring exception in command %s", ctx.command, exc_info=error)
+
+    def _observe(self, ctx: Context, outcome: str) -> None:
+        started = self._invoked_at.pop(id(ctx), None)
+        if started is not None:
+            COMMAND_LATENCY.labels(ctx.command.qualified_name, outcome).observe(time.perf_counter() - started)
+
+    async def _sample_loop_lag(self) -> None:
+        """Sleep for a fixed interval, over and over, and record how late we wake up."""
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            LOOP_LAG.observe(max(0.0, time.perf_counter() - started - LOOP_LAG_INTERVAL))
+
+    async def _serve_metrics(self, request: "web.Request") -> "web.Response":
+        """Serve every metric in Prometheus' text format."""
+        from aiohttp import web
+
+        return web.Response(body=REGISTRY.render().encode(), headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
+
+    @commands.command()
+    @commands.is_owner()
+    async def stats(self, ctx: Context):
+        """Show how long commands, upstream requests and Discord requests are taking."""
+        lines = []
+        for family in REGISTRY.families.values():
+            if not family.children:
+                continue
+
+            lines.append(f"{family.name} (ms)")
+            lines.append(f"  {'':<44} {'count':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+            for values, histogram in sorted(family.children.items()):
+                name = " ".join(values) or "all"
+                lines.append(
+                    f"  {name[:44]:<44} {histogram.count:>7} {histogram.quantile(0.5) * 1000:>8.1f} "
+                    f"{histogram.quantile(0.95) * 1000:>8.1f} {histogram.quantile(0.99) * 1000:>8.1f}"
+                )
+
+        body = "\n".join(lines) or "Nothing's been measured yet."
+        limit = MAX_MESSAGE_LENGTH - len("```\n\n```")
+        if len(body) > limit:
+            body = body[:limit - 1] + "…"
+        await ctx.send(f"```\n{body}\n```")
+
+    @commands.command()
+    @commands.is_owner()
+    async def memory(self, ctx: Context):
+        """Show how much memory the bot is using, and how much it has cached."""
+        body = "\n".join(memory_report(self.bot))
+        await ctx.send(f"```\n{body}\n```")
+
+
+async def setup(bot: Bot) -> None:
+    """Load the stats cog."""
+    await bot.add_cog(Stats(bot))
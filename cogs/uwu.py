@@ -1,9 +1,8 @@
 from collections.abc import Callable
 import contextlib
-import random
+import copy
+import os
 import re
-import typing as t
-from dataclasses import dataclass
 from functools import partial
 
 import discord
@@ -11,77 +10,91 @@ from discord import Embed, Message
 from discord.ext import commands
 from discord.ext.commands import Cog, Context, clean_content, Bot, MessageConverter
 
-
-WORD_REPLACE = {
-    "small": "smol",
-    "cute": "kawaii~", 
-    "fluff": "floof",
-    "love": "luv",
-    "stupid": "baka",
-    "idiot": "baka",
-    "what": "nani",
-    "meow": "nya~",
-    "roar": "rawrr~",
-}
-
-EMOJIS = [
-    "rawr x3",
-    "OwO",
-    "UwU",
-    "o.O",
-    "-.-",
-    ">w<",
-    ">~<",
-    ">///<",
-    "σωσ",
-    "òωó",
-    "ʘwʘ",
-    ":3",
-    "XD",
-    "nyaa~~",
-    "mya",
-    ">_<",
-    "rawr",
-    "uwu",
-    "^^",
-    "^^;;",
-]
-
-REGEX_WORD_REPLACE = re.compile(r"(?<!w)[lr](?!w)")
-
-REGEX_PUNCTUATION = re.compile(r"[.!?\r\n\t]")
-
-REGEX_STUTTER = re.compile(r"(\s)([a-zA-Z])")
-SUBSTITUTE_STUTTER = r"\g<1>\g<2>-\g<2>"
-
-REGEX_NYA = re.compile(r"n([aeou][^aeiou])")
-SUBSTITUTE_NYA = r"ny\1"
-
-REGEX_EMOJI = re.compile(r"<(a)?:(\w+?):(\d{15,21}?)>", re.ASCII)
-
-
-@dataclass(frozen=True, eq=True)
-class Emoji:
-    """Data class for an Emoji."""
-
-    name: str
-    uid: int
-    animated: bool = False
-
-    def __str__(self):
-        anim_bit = "a" if self.animated else ""
-        return f"<{anim_bit}:{self.name}:{self.uid}>"
-
-    def can_display(self, bot: Bot) -> bool:
-        """Determines if a bot is in a server with the emoji."""
-        return bot.get_emoji(self.uid) is not None
-
-    @classmethod
-    def from_match(cls, match: tuple[str, str, str]) -> t.Optional["Emoji"]:
-        """Creates an Emoji from a regex match tuple."""
-        if not match or len(match) != 3 or not match[2].isdecimal():
-            return None
-        return cls(match[1], int(match[2]), match[0] == "a")
+from utils.metrics import DISCORD_LATENCY
+from utils.resources import get_resources
+from utils.rng import RandomStream
+from utils.uwu import UwuTransformer, get_transformer
+from utils.workers import WorkerPool, WorkerPoolFull
+
+# Messages (plus their embed) shorter than this are uwuified right on the event loop,
+# anything longer is handed to a worker. "thread" or "process" picks the kind of worker.
+UWU_EXECUTOR = os.environ.get("UWU_EXECUTOR", "thread")
+UWU_WORKERS = int(os.environ.get("UWU_WORKERS", 2))
+UWU_INLINE_BELOW = 2000
+UWU_MAX_QUEUE = 32
+UWU_MAX_PER_USER = 2
+
+
+def suppress_links(message: str) -> str:
+    """Accepts a message that may contain links, suppresses them, and returns them."""
+    for link in set(re.findall(r"https?://[^\s]+", message, re.IGNORECASE)):
+        message = message.replace(link, f"<{link}>")
+    return message
+
+
+def convert_embed(func: Callable[[list[str]], list[str]], embed: Embed, *extra: str) -> tuple[Embed, list[str]]:
+    """
+    Converts all the text in an embed with a single call to a batch conversion function.
+
+    Only converts the following fields: title, description, footer, fields. Any `extra`
+    strings are converted in the same batch, after the embed's own, and returned too.
+
+    Returns a tuple of a patched copy of the embed, leaving the original alone, and the converted extras.
+    """
+    segments = [embed.title or "", embed.description or "", embed.footer.text or ""]
+    for field in embed.fields:
+        segments += [field.name or "", field.value or ""]
+    segments.extend(extra)
+
+    converted = iter(func(segments))
+    # A shallow copy shares its footer and fields with the original, so those get replaced below
+    patched = copy.copy(embed)
+
+    title, description, footer = next(converted), next(converted), next(converted)
+    if embed.title is not None:
+        patched.title = title
+    if embed.description is not None:
+        patched.description = description
+    if embed.footer.text is not None:
+        patched.set_footer(text=footer, icon_url=embed.footer.icon_url)
+
+    if embed.fields:
+        patched._fields = [
+            {**field, "name": next(converted), "value": next(converted)}
+            for field in embed._fields
+        ]
+
+    return patched, list(converted)
+
+
+def uwuify_message(
+    transformer: UwuTransformer,
+    text: str | None,
+    embed: Embed | None,
+    seed: int | None = None,
+) -> tuple[str | None, Embed | None]:
+    """
+    Uwuify a message's text and embed, ready to be sent.
+
+    Everything is uwuified in one batch, with one RNG stream, seeded with `seed` if
+    it's given. This only touches plain strings and embeds, so it can run in a worker
+    thread or process.
+    """
+    rng = RandomStream(seed)
+    if embed is not None:
+        embed, converted = convert_embed(partial(transformer.uwuify_many, rng=rng), embed, *([text] if text else []))
+        text = converted[0] if converted else None
+    elif text:
+        text = transformer.uwuify(text, rng=rng)
+
+    # Adds the text harvested from an embed to be put into another quote block.
+    if text:
+        text = suppress_links(text)
+        text = f">>> {text.lstrip('> ')}"
+    else:
+        text = None
+
+    return text, embed
 
 
 class Uwu(Cog):
@@ -89,12 +102,47 @@ class Uwu(Cog):
 
     def __init__(self, bot: Bot):
         self.bot = bot
+        self.transformer = get_transformer(bot)
+        self.emoji_index = self.transformer.emoji_index
+        # The pool lives on the bot, so jobs that are still running survive a reload
+        self.pool = get_resources(bot).get("uwu.pool", lambda: WorkerPool(
+            kind=UWU_EXECUTOR,
+            workers=UWU_WORKERS,
+            max_queue=UWU_MAX_QUEUE,
+            per_user=UWU_MAX_PER_USER,
+            inline_below=UWU_INLINE_BELOW,
+        ))
+
+    async def cog_load(self) -> None:
+        """Start the workers, and index the emoji we can already see, in case we're loaded after the bot is ready."""
+        if self.pool.kind == "process":
+            # Worker processes keep running the code they were started with, so after a reload they need replacing
+            self.pool.restart()
+        else:
+            self.pool.start()
+        self.emoji_index.rebuild(self.bot)
+
+    @Cog.listener()
+    async def on_ready(self) -> None:
+        """Index every emoji once the bot has seen all of its servers."""
+        self.emoji_index.rebuild(self.bot)
+
+    @Cog.listener()
+    async def on_guild_emojis_update(self, guild: discord.Guild, before, after) -> None:
+        """Re-index when a server adds or removes emoji."""
+        self.emoji_index.rebuild(self.bot)
+
+    @Cog.listener("on_guild_join")
+    @Cog.listener("on_guild_remove")
+    @Cog.listener("on_guild_available")
+    @Cog.listener("on_guild_unavailable")
+    async def on_guild_change(self, guild: discord.Guild) -> None:
+        """Servers coming and going take their emoji with them."""
+        self.emoji_index.rebuild(self.bot)
 
     def _suppress_links(self, message: str) -> str:
         """Accepts a message that may contain links, suppresses them, and returns them."""
-        for link in set(re.findall(r"https?://[^\s]+", message, re.IGNORECASE)):
-            message = message.replace(link, f"<{link}>")
-        return message
+        return suppress_links(message)
     
     async def _get_discord_message(self, ctx: Context, text: str) -> Message | str:
         """
@@ -107,6 +155,25 @@ class Uwu(Cog):
             text = await MessageConverter().convert(ctx, text)
         return text
     
+    async def _get_referenced_message(self, ctx: Context) -> Message | None:
+        """
+        Get the message that the command is a reply to, if it is one.
+
+        Discord usually sends the message along with the reply, but if it didn't, and
+        it's not cached, we fetch it rather than relying on a big message cache.
+        """
+        reference = ctx.message.reference
+        if reference is None:
+            return None
+        if isinstance(reference.resolved, Message):
+            return reference.resolved
+        if isinstance(reference.resolved, discord.DeletedReferencedMessage) or reference.message_id is None:
+            return None
+
+        with contextlib.suppress(discord.HTTPException):
+            return await ctx.channel.fetch_message(reference.message_id)
+        return None
+
     async def _get_text_and_embed(self, ctx: Context, text: str) -> tuple[str, Embed | None]:
         """
         Attempts to extract the text and embed from a possible link to a discord Message.
@@ -132,93 +199,29 @@ class Uwu(Cog):
 
         return text, embed
     
-    def _convert_embed(self, func: Callable[[str, ], str], embed: Embed) -> Embed:
+    def _convert_embed(self, func: Callable[[list[str]], list[str]], embed: Embed) -> Embed:
         """
-        Converts the text in an embed using a given conversion function, then return the embed.
+        Converts the text in an embed using a given batch conversion function, then return a patched copy of the embed.
 
         Only modifies the following fields: title, description, footer, fields
         """
-        embed_dict = embed.to_dict()
-
-        embed_dict["title"] = func(embed_dict.get("title", ""))
-        embed_dict["description"] = func(embed_dict.get("description", ""))
-
-        if "footer" in embed_dict:
-            embed_dict["footer"]["text"] = func(embed_dict["footer"].get("text", ""))
-
-        if "fields" in embed_dict:
-            for field in embed_dict["fields"]:
-                field["name"] = func(field.get("name", ""))
-                field["value"] = func(field.get("value", ""))
-
-        return Embed.from_dict(embed_dict)
-
-    def _word_replace(self, input_string: str) -> str:
-        """Replaces words that are keys in the word replacement hash to the values specified."""
-        for word, replacement in WORD_REPLACE.items():
-            input_string = input_string.replace(word, replacement)
-        return input_string
-
-    def _char_replace(self, input_string: str) -> str:
-        """Replace certain characters with 'w'."""
-        return REGEX_WORD_REPLACE.sub("w", input_string)
-
-    def _stutter(self, strength: float, input_string: str) -> str:
-        """Adds stuttering to a string."""
-        return REGEX_STUTTER.sub(partial(self._stutter_replace, strength=strength), input_string, 0)
-
-    def _stutter_replace(self, match: re.Match, strength: float = 0.0) -> str:
-        """Replaces a single character with a stuttered character."""
-        match_string = match.group()
-        if random.random() < strength:
-            return f"{match_string}-{match_string[-1]}"  # Stutter the last character
-        return match_string
-
-    def _nyaify(self, input_string: str) -> str:
-        """Nyaifies a string by adding a 'y' between an 'n' and a vowel."""
-        return REGEX_NYA.sub(SUBSTITUTE_NYA, input_string, 0)
-
-    def _emoji(self, strength: float, input_string: str) -> str:
-        """Replaces some punctuation with emoticons."""
-        return REGEX_PUNCTUATION.sub(partial(self._emoji_replace, strength=strength), input_string, 0)
-
-    def _emoji_replace(self, match: re.Match, strength: float = 0.0) -> str:
-        """Replaces a punctuation character with an emoticon."""
-        match_string = match.group()
-        if random.random() < strength:
-            return f" {random.choice(EMOJIS)} "
-        return match_string
-
-    def _ext_emoji_replace(self, input_string: str) -> str:
-        """Replaces any emoji the bot cannot send in input_text with a random emoticons."""
-        groups = REGEX_EMOJI.findall(input_string)
-        emojis = {Emoji.from_match(match) for match in groups}
-        # Replace with random emoticon if unable to display
-        emojis_map = {
-            re.escape(str(e)): random.choice(EMOJIS)
-            for e in emojis if e and not e.can_display(self.bot)
-        }
-        if emojis_map:
-            # Pattern for all emoji markdowns to be replaced
-            emojis_re = re.compile("|".join(emojis_map.keys()))
-            # Replace matches with random emoticon
-            return emojis_re.sub(
-                lambda m: emojis_map[re.escape(m.group())],
-                input_string
-            )
-        # Return original if no replacement
-        return input_string
-
-    def _uwuify(self, input_string: str, *, stutter_strength: float = 0.2, emoji_strength: float = 0.25) -> str:
+        return convert_embed(func, embed)[0]
+
+    def _uwuify(
+        self,
+        input_string: str,
+        *,
+        stutter_strength: float = 0.2,
+        emoji_strength: float = 0.25,
+        rng: RandomStream | None = None,
+    ) -> str:
         """Takes a string and returns an uwuified version of it."""
-        input_string = input_string.lower()
-        input_string = self._word_replace(input_string)
-        input_string = self._nyaify(input_string)
-        input_string = self._char_replace(input_string)
-        input_string = self._stutter(stutter_strength, input_string)
-        input_string = self._emoji(emoji_strength, input_string)
-        input_string = self._ext_emoji_replace(input_string)
-        return input_string
+        return self.transformer.uwuify(
+            input_string,
+            stutter_strength=stutter_strength,
+            emoji_strength=emoji_strength,
+            rng=rng,
+        )
 
     @commands.command(name="uwu", aliases=("uwuwize", "uwuify",))
     async def uwu_command(self, ctx: Context, *, text: str | None = None) -> None:
@@ -230,7 +233,7 @@ class Uwu(Cog):
         'hewwo, m-my name is j-john nyaa~'.
         """
         # If `text` isn't provided then we try to get message content of a replied message
-        text = text or getattr(ctx.message.reference, "resolved", None)
+        text = text or await self._get_referenced_message(ctx)
         if isinstance(text, discord.Message):
             embeds = text.embeds
             text = text.content
@@ -245,24 +248,35 @@ class Uwu(Cog):
 
         # Grabs the text from the embed for uwuification
         if embeds:
-            embed = self._convert_embed(self._uwuify, embeds[0])
+            embed = embeds[0]
         else:
             # Parse potential message links in text
             text, embed = await self._get_text_and_embed(ctx, text)
 
-            # If an embed is found, grab and uwuify its text
-            if embed:
-                embed = self._convert_embed(self._uwuify, embed)
-
-        # Adds the text harvested from an embed to be put into another quote block.
-        if text:
-            converted_text = self._uwuify(text)
-            converted_text = self._suppress_links(converted_text)
-            converted_text = f">>> {converted_text.lstrip('> ')}"
-        else:
-            converted_text = None
-
-        await ctx.send(content=converted_text, embed=embed)
+        # Big messages are uwuified in a worker, so they don't hold up the whole bot
+        # An embed with only an image in it has no length, but still has to be sent back
+        size = len(text or "") + (len(embed) if embed is not None else 0)
+        try:
+            converted_text, embed = await self.pool.run(
+                ctx.author.id,
+                size,
+                uwuify_message,
+                self.transformer,
+                text,
+                embed,
+            )
+        except WorkerPoolFull as error:
+            return await ctx.send(f"❌ {error}")
+
+        with DISCORD_LATENCY.labels("send").time():
+            await ctx.send(content=converted_text, embed=embed)
+
+    @commands.command(name="uwu_stats", aliases=("uwu-stats",))
+    @commands.is_owner()
+    async def uwu_stats(self, ctx: Context) -> None:
+        """Show how busy the uwu workers are, and how long uwuifying takes."""
+        stats = "\n".join(f"  {name}: {value:g}" for name, value in self.pool.stats.as_dict().items())
+        await ctx.send(f"```\nuwu workers ({self.pool.kind} x{self.pool.workers})\n{stats}\n```")
 
 
 async def setup(bot: Bot) -> None:
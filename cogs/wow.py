@@ -1,31 +1,90 @@
+import asyncio
+import hashlib
 import io
+import logging
 import os
-import random
-import time
+import typing as t
+from pathlib import Path
 
 import aiohttp
-from aiowowapi import WowApi
 from discord import File
 from discord.ext import commands
 from discord.ext.commands import Cog, Bot, Context
 
-from cogs.uwu import Uwu
-from constants.warcraft import LONGCLASS_TO_SHORTCLASS 
-from constants.warcraft import CLASS_SPECS_FULL 
-from constants.warcraft import CLASS_ICONS
-from constants.warcraft import CLASS_BREAKDOWN
-from constants.warcraft import HEALER, TANK, MELEE, DPS, RANGED, CLASSES, CLASS_TO_SPECS
-
-# These also need to exist in the environment variables for Railway, or we 
-# can't connect to the WoW API.
-BNET_CLIENT_ID = os.environ["BNET_CLIENT_ID"]
-BNET_CLIENT_SECRET = os.environ["BNET_CLIENT_SECRET"]
+from constants.warcraft import CLASS_COLORS, CLASS_ICONS, SPECS_BY_NAME, TREAT_ICON, Spec
+from utils.cache import TTLCache
+from utils.class_filter import ClassFilterError, select_specs
+from utils.disk_cache import DiskCache
+from utils.http import DownloadError, create_session, download_cached
+from utils.metrics import DISCORD_LATENCY
+from utils.ratelimit import TokenBucket
+from utils.resources import get_resources
+from utils.roster import RosterEntry, RosterPages, describe_profile, roster_entries, slugify
+from utils.scheduler import Priority, UpstreamUnavailable, request_priority
+from utils.rng import RandomStream
+from utils.uwu import UwuTransformer, get_transformer
+from utils.workers import WorkerPool, WorkerPoolFull
+
+if t.TYPE_CHECKING:
+    from utils.battlenet import BattleNet
+    from utils.party import TileSource
+
+log = logging.getLogger(__name__)
 
 # Constants
-ALLOWED_CLASS_TYPES = (
-    "ALL", "TANK", "HEALER", "DPS", "RANGED", "MELEE",
-)
-ALL = HEALER + TANK + DPS
+
+# BNET_CLIENT_ID and BNET_CLIENT_SECRET also need to exist in the environment
+# variables for Railway, or we can't connect to the WoW API. They're read when
+# the cog is loaded, along with BNET_BASE_URL, which points the bot at another
+# Battle.net, like the fake one the load tests use, if it's set.
+
+# How many connections each region's Battle.net client may keep open at once.
+BNET_MAX_CONNECTIONS = 10
+
+# Limits for downloading character renders from the CDN.
+IMAGE_MAX_BYTES = 25 * 1024 * 1024
+IMAGE_CHUNK_SIZE = 64 * 1024
+IMAGE_TIMEOUT = 15
+CDN_MAX_CONNECTIONS = 20
+CDN_MAX_CONNECTIONS_PER_HOST = 4
+
+# Downloaded renders are kept on disk, and only revalidated with the CDN once they're an hour old.
+IMAGE_CACHE_DIR = Path(os.environ.get("IMAGE_CACHE_DIR", Path(__file__).parent.parent / ".cache" / "images"))
+IMAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+IMAGE_CACHE_FRESH_FOR = 60 * 60
+
+# Discord allows roughly 5 message edits per 5 seconds in each channel.
+EDIT_RATE = 1
+EDIT_BURST = 5
+
+# `!roster` keeps at most this many Battle.net requests in flight at once, and
+# shows what it's found so far at most this often, in seconds.
+ROSTER_CONCURRENCY = 8
+ROSTER_REFRESH_INTERVAL = 1.5
+
+# `!party` draws its picture in a pool of workers, "process" or "thread", so resizing and
+# pasting images never holds up the bot. Drawn tiles are kept for a while, so drawing
+# the same characters again is mostly just laying them out.
+RENDER_EXECUTOR = os.environ.get("RENDER_EXECUTOR", "process")
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", 2))
+RENDER_MAX_QUEUE = 8
+PARTY_MAX_SIZE = 40
+PARTY_PICTURES = ("inset", "avatar")
+BNET_REGIONS = ("eu", "us", "kr", "tw", "cn")
+PARTY_TILE_CACHE_SIZE = 256
+PARTY_TILE_TTL = 60 * 60
+EMOJI_URL = "https://cdn.discordapp.com/emojis/{id}.png"
+
+# Full renders are large lossless PNGs, so images are shrunk before they're uploaded, to fit
+# within UPLOAD_MAX_SIDE pixels and UPLOAD_BUDGET bytes. Anything smaller than UPLOAD_PASSTHROUGH
+# is sent as it is. Shrinking has workers of its own, separate from `!party`'s, with room for
+# everyone who's waiting on an image at once. Shrunk images are kept in the image cache.
+UPLOAD_MAX_SIDE = int(os.environ.get("UPLOAD_MAX_SIDE", 1280))
+UPLOAD_BUDGET = int(os.environ.get("UPLOAD_BUDGET", 1024 * 1024))
+UPLOAD_PASSTHROUGH = 256 * 1024
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", 2))
+UPLOAD_MAX_QUEUE = 64
+UPLOAD_MAX_PER_USER = 4
 
 class Wow(Cog):
     """Commands that leverage the WoW API."""
@@ -33,16 +92,79 @@ class Wow(Cog):
     def __init__(self, bot: Bot):
         """Initialize this cog with the Bot instance."""
         self.bot = bot
-
-    async def _uwuify(self, text: str):
+        self.resources = get_resources(bot)
+        self._credentials: tuple[str, str] | None = None
+        self._base_url: str | None = None
+        self.http_session: aiohttp.ClientSession | None = None
+        # These live on the bot, so a reload doesn't throw away what's been cached or rate limited so far
+        self.image_cache = self.resources.get(
+            "wow.image_cache",
+            lambda: DiskCache(IMAGE_CACHE_DIR, max_bytes=IMAGE_CACHE_MAX_BYTES, fresh_for=IMAGE_CACHE_FRESH_FOR),
+        )
+        self._edit_buckets: dict[int, TokenBucket] = self.resources.get("wow.edit_buckets", dict)
+        self.party_tiles: TTLCache = self.resources.get("wow.party_tiles", lambda: TTLCache(PARTY_TILE_CACHE_SIZE))
+        self.uwu: UwuTransformer = get_transformer(bot)
+
+    async def cog_load(self) -> None:
+        """Read the Battle.net credentials and get the shared CDN session when the cog is loaded."""
+        self._credentials = (os.environ["BNET_CLIENT_ID"], os.environ["BNET_CLIENT_SECRET"])
+        self._base_url = os.environ.get("BNET_BASE_URL")
+        self.http_session = self.resources.get(
+            "wow.http_session",
+            lambda: create_session(
+                limit=CDN_MAX_CONNECTIONS,
+                limit_per_host=CDN_MAX_CONNECTIONS_PER_HOST,
+                timeout=IMAGE_TIMEOUT,
+            ),
+        )
+
+    @property
+    def battlenet(self) -> "BattleNet":
+        """The shared Battle.net clients, created the first time a command needs them."""
+        return self.resources.get("wow.battlenet", self._create_battlenet)
+
+    def _create_battlenet(self) -> "BattleNet":
+        # Importing aiowowapi takes a while, and plenty of commands never need it
+        from utils.battlenet import BattleNet
+
+        client_id, client_secret = self._credentials
+        return BattleNet(client_id, client_secret, max_connections=BNET_MAX_CONNECTIONS, base_url=self._base_url)
+
+    @property
+    def render_pool(self) -> WorkerPool:
+        """The workers `!party` draws in, started the first time they're needed."""
+        return self.resources.get(
+            "wow.render_pool",
+            lambda: self._create_pool(RENDER_WORKERS, max_queue=RENDER_MAX_QUEUE, per_user=1),
+        )
+
+    @property
+    def upload_pool(self) -> WorkerPool:
+        """The workers images are shrunk in before they're uploaded, started the first time they're needed."""
+        return self.resources.get(
+            "wow.upload_pool",
+            lambda: self._create_pool(UPLOAD_WORKERS, max_queue=UPLOAD_MAX_QUEUE, per_user=UPLOAD_MAX_PER_USER),
+        )
+
+    @staticmethod
+    def _create_pool(workers: int, *, max_queue: int, per_user: int) -> WorkerPool:
+        pool = WorkerPool(kind=RENDER_EXECUTOR, workers=workers, max_queue=max_queue, per_user=per_user, inline_below=0)
+        pool.start()
+        return pool
+
+    def _uwuify(self, text: str, rng: RandomStream) -> str:
         """Uwuify the text."""
-        return Uwu(self.bot)._uwuify(text)
+        return self.uwu.uwuify(text, rng=rng)
 
     async def _get_image_from_url(self, image_url: str):
-        """Use aiohttp to download a file, and return the IO stream for this file."""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(image_url) as response:
-                return io.BytesIO(await response.read())
+        """Fetch a file from the CDN through the disk cache, and return the IO stream for this file."""
+        return await download_cached(
+            self.http_session,
+            self.image_cache,
+            image_url,
+            max_bytes=IMAGE_MAX_BYTES,
+            chunk_size=IMAGE_CHUNK_SIZE,
+        )
 
     async def _send_image(self, ctx: Context, image_path: str = None, image_url: str = None, image: io.BytesIO = None):
         """Send an image to the channel."""
@@ -52,61 +174,284 @@ class Wow(Cog):
             return await ctx.send("Please only provide one image as input.")
 
         if image_url:
-            image = await self._get_image_from_url(image_url)
+            try:
+                image = await self._get_image_from_url(image_url)
+            except DownloadError as error:
+                return await ctx.send(f"❌ {error}")
 
         if image_path:
-            image = image_path
-        
-        await ctx.send(file=File(image, "super_cool_image_you_guys.png"))
+            file = File(image_path, "super_cool_image_you_guys.png")
+        else:
+            data, extension = await self._shrink_for_upload(ctx, image.getvalue())
+            file = File(io.BytesIO(data), f"super_cool_image_you_guys.{extension}")
+
+        with DISCORD_LATENCY.labels("send").time():
+            await ctx.send(file=file)
+
+    async def _shrink_for_upload(self, ctx: Context, data: bytes) -> tuple[bytes, str]:
+        """
+        Shrink an image to fit the upload budget, and return it along with its file extension.
+
+        Shrunk images are cached by the hash of the original, so they're only redone when
+        the original changes, and people asking for the same image at once share one
+        shrink. If the workers are too busy, or the original isn't an image Pillow can
+        read, the original is sent as it is.
+        """
+        # Pillow takes a while to import, and most commands never need it
+        from utils.transcode import DECODE_ERRORS, image_extension
+
+        if len(data) <= UPLOAD_PASSTHROUGH:
+            return data, image_extension(data)
+
+        key = f"transcoded:{UPLOAD_MAX_SIDE}:{UPLOAD_BUDGET}:{hashlib.sha256(data).hexdigest()}"
+        if (cached := await self.image_cache.get(key)) is not None:
+            return cached.data, image_extension(cached.data)
+
+        try:
+            shrunk = await self.image_cache.single_flight(key, lambda: self._shrink(ctx.author.id, key, data))
+        except WorkerPoolFull:
+            log.info("The upload workers are busy, uploading a %d byte image as it is", len(data))
+            return data, image_extension(data)
+        except DECODE_ERRORS as error:
+            log.warning("Couldn't read a %d byte image to shrink it, uploading it as it is: %s", len(data), error)
+            return data, image_extension(data)
+        return shrunk, image_extension(shrunk)
+
+    async def _shrink(self, user: int, key: str, data: bytes) -> bytes:
+        """Shrink an image in the upload workers, and cache the result under `key`."""
+        from utils.transcode import transcode
+
+        shrunk = await self.upload_pool.run(user, len(data), transcode, data, UPLOAD_MAX_SIDE, UPLOAD_BUDGET, UPLOAD_PASSTHROUGH)
+        await self.image_cache.put(key, shrunk)
+        return shrunk
 
     async def _get_image(self, player_name: str, image_type: str, realm: str = "argent-dawn", region: str = "eu"):
         """Get a certain player image."""
-        async with WowApi(BNET_CLIENT_ID, BNET_CLIENT_SECRET, region, request_debugging=True) as Client:
-            images = await Client.Retail.Profile.get_character_media_summary(realm, player_name.lower())
-
-            if image_type == "avatar":
-                return images["assets"][0]["value"]
-            elif image_type == "inset":
-                return images["assets"][1]["value"]
-            elif image_type == "main":
-                return images["assets"][2]["value"]
-            elif image_type == "main-raw":
-                return images["assets"][3]["value"]
-            
+        images = await self.battlenet.get_character_media_summary(region, realm, player_name)
+
+        if image_type == "avatar":
+            return images["assets"][0]["value"]
+        elif image_type == "inset":
+            return images["assets"][1]["value"]
+        elif image_type == "main":
+            return images["assets"][2]["value"]
+        elif image_type == "main-raw":
+            return images["assets"][3]["value"]
+
     async def _get_race(self, player_name: str, realm: str = "argent-dawn", region: str = "eu"):
         """Get the player race and gender, e.g. Male Dark Iron Dwarf"""
-        async with WowApi(BNET_CLIENT_ID, BNET_CLIENT_SECRET, region, request_debugging=True) as Client:
-            profile = await Client.Retail.Profile.get_character_profile_summary(realm, player_name.lower())
-            race = profile["race"]["name"]
-            gender = profile["gender"]["name"]
+        profile = await self.battlenet.get_character_profile_summary(region, realm, player_name)
+        race = profile["race"]["name"]
+        gender = profile["gender"]["name"]
 
-            return f"{gender} {race}"
-        
-    async def _get_random_class_spec(self, allowed_classes: list[str]) -> str:
-        """Select and return a random class/spec, and add the correct icon string"""
-        selected_class_spec = random.choice(allowed_classes)
-        selected_class = CLASS_BREAKDOWN[selected_class_spec][0]
-        selected_spec = CLASS_BREAKDOWN[selected_class_spec][1]
-        selected_class_shortform = LONGCLASS_TO_SHORTCLASS[selected_class_spec]
+        return f"{gender} {race}"
+
+    async def _get_random_class_spec(self, allowed_classes: t.Sequence[Spec], rng: RandomStream) -> str:
+        """Select and return a random class/spec, with the correct icon string"""
+        spec = rng.choice(allowed_classes)
 
         # Add a very small chance of using the treat icon instead of the class icon
-        if random.randint(1, 100) <= 6:
-            selected_class_icon = f"<:treat:{CLASS_ICONS['treat']}>"
-            uwu_class = await self._uwuify(selected_class)
-            uwu_spec = await self._uwuify(selected_spec)
-            return f"{selected_class_icon}   **{uwu_spec.title()}** {uwu_class.title()}"
-        
+        if rng.randint(1, 100) <= 6:
+            uwu_class = self._uwuify(spec.class_name, rng)
+            uwu_spec = self._uwuify(spec.spec_name, rng)
+            return f"{TREAT_ICON}   **{uwu_spec.title()}** {uwu_class.title()}"
+
         # Otherwise, we do it all properly and shit
-        else:
-            selected_class_icon = f"<:{selected_class_shortform}:{CLASS_ICONS[selected_class_shortform]}>"
-            return f"{selected_class_icon}   **{selected_spec}** {selected_class}"
+        return spec.label
 
     @commands.command()
     async def show_character(self, ctx: Context, player: str, realm: str = "argent-dawn", image_type: str = "main", region: str = "eu"):
         """Show an image of a specific WoW character."""
-        image = await self._get_image(player, image_type, realm, region)
+        try:
+            image = await self._get_image(player, image_type, realm, region)
+        except UpstreamUnavailable as error:
+            return await ctx.send(f"❌ {error}")
         await self._send_image(ctx, image_url=image)
 
+    @commands.command(aliases=("guild",))
+    async def roster(self, ctx: Context, guild: str, realm: str = "argent-dawn", region: str = "eu"):
+        """
+        Show everyone in a guild, with their race, spec and item level.
+
+        Members are looked up a few at a time, and the message fills in as they come back.
+
+        Example:
+            !roster "Oomfie and the Banshees"
+            !roster oomfie-and-the-banshees argent-dawn eu
+        """
+        try:
+            roster = await self.battlenet.get_guild_roster(region, slugify(realm), slugify(guild))
+        except aiohttp.ClientResponseError as error:
+            if error.status == 404:
+                return await ctx.send(f"❌ I couldn't find a guild called {guild} on {realm}.")
+            raise
+        except UpstreamUnavailable as error:
+            return await ctx.send(f"❌ {error}")
+
+        entries = roster_entries(roster)
+        pages = RosterPages(roster.get("guild", {}).get("name", guild), entries)
+        with DISCORD_LATENCY.labels("send").time():
+            message = await ctx.send(embed=pages.embed(), view=pages)
+
+        # The lookups go behind anyone else's commands if we're up against Blizzard's quota
+        semaphore = asyncio.Semaphore(ROSTER_CONCURRENCY)
+        with request_priority(Priority.BULK):
+            pending = {asyncio.create_task(self._look_up_member(entry, region, semaphore)) for entry in entries}
+        bucket = self._edit_bucket(ctx.channel.id)
+        shown = 0
+        try:
+            while pending:
+                _, pending = await asyncio.wait(pending, timeout=ROSTER_REFRESH_INTERVAL)
+                done = len(entries) - len(pending)
+                if done == shown:
+                    continue
+
+                # Progress can wait for the next refresh if we're out of edits, but the final page can't
+                if not pending:
+                    await bucket.acquire()
+                elif not bucket.try_acquire():
+                    continue
+
+                shown = done
+                with DISCORD_LATENCY.labels("edit").time():
+                    await message.edit(embed=pages.embed(), view=pages)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _look_up_member(self, entry: RosterEntry, region: str, semaphore: asyncio.Semaphore) -> None:
+        """Fill in a roster entry from the member's profile and media, sharing `semaphore` with the rest of the roster."""
+        async def fetch(lookup):
+            async with semaphore:
+                return await lookup(region, entry.realm, entry.name)
+
+        profile, media = await asyncio.gather(
+            fetch(self.battlenet.get_character_profile_summary),
+            fetch(self.battlenet.get_character_media_summary),
+            return_exceptions=True,
+        )
+
+        if isinstance(profile, aiohttp.ClientResponseError) and profile.status == 404:
+            # Characters that haven't logged in for a while, or are too low level, have no public profile
+            entry.error = "no public profile"
+        elif isinstance(profile, UpstreamUnavailable):
+            entry.error = "Battle.net isn't answering"
+        elif isinstance(profile, Exception):
+            log.warning("Failed to look up %s-%s", entry.name, entry.realm, exc_info=profile)
+            entry.error = "couldn't look them up"
+        else:
+            entry.description = describe_profile(profile)
+
+        if not isinstance(media, Exception):
+            entry.avatar = next((asset["value"] for asset in media.get("assets", ()) if asset["key"] == "avatar"), None)
+
+    @commands.command(aliases=("raid",))
+    async def party(self, ctx: Context, *players: str):
+        """
+        Draw several characters side by side, like raid frames.
+
+        Each character is their name, optionally followed by a dash and their realm.
+        Start with "avatar" to draw their avatars instead of their portraits, and with
+        a region, like "us", to look them up somewhere other than the EU.
+
+        Example:
+            !party Lemon Nanners
+            !party avatar Lemon-argent-dawn Shadowmeld-silvermoon
+            !party us avatar Lemon-area-52
+        """
+        # Pillow takes a while to import, and most commands never need it
+        from utils.party import TileSource, render_party
+
+        kind, region = PARTY_PICTURES[0], "eu"
+        while players and players[0].lower() in PARTY_PICTURES + BNET_REGIONS:
+            option, players = players[0].lower(), players[1:]
+            if option in PARTY_PICTURES:
+                kind = option
+            else:
+                region = option
+        if not players:
+            return await ctx.send("❌ Please tell me who to draw, like `!party Lemon Nanners`.")
+        if len(players) > PARTY_MAX_SIZE:
+            return await ctx.send(f"❌ That's more than a whole raid, I can only draw {PARTY_MAX_SIZE} at once.")
+
+        tiles = await asyncio.gather(*(self._party_tile(player, kind, region) for player in players))
+        try:
+            rendered, picture = await self.render_pool.run(
+                ctx.author.id, len(tiles), render_party, [tile for _, tile in tiles]
+            )
+        except WorkerPoolFull as error:
+            return await ctx.send(f"❌ {error}")
+
+        for (key, tile), drawn in zip(tiles, rendered):
+            # Don't hang on to a tile we couldn't get the picture for, it may work next time
+            if isinstance(tile, TileSource) and tile.picture is not None:
+                self.party_tiles.set(key, drawn, PARTY_TILE_TTL)
+
+        with DISCORD_LATENCY.labels("send").time():
+            await ctx.send(file=File(io.BytesIO(picture), "party.png"))
+
+    async def _party_tile(self, player: str, kind: str, region: str = "eu") -> tuple[tuple, "bytes | TileSource"]:
+        """
+        Look up a character for `!party`.
+
+        Returns the key their tile is cached under, along with either the cached tile,
+        or a `TileSource` with everything needed to draw it. Anything we can't look up
+        or download is left blank.
+        """
+        from utils.party import TileSource
+
+        name, _, realm = player.partition("-")
+        realm = realm or "argent-dawn"
+        profile, media = await asyncio.gather(
+            self.battlenet.get_character_profile_summary(region, realm, name),
+            self.battlenet.get_character_media_summary(region, realm, name),
+            return_exceptions=True,
+        )
+
+        label, color, spec = name.title(), "#FFFFFF", None
+        if not isinstance(profile, Exception):
+            class_name = profile["character_class"]["name"]
+            label, color = profile["name"], CLASS_COLORS.get(class_name, color)
+            if active_spec := profile.get("active_spec"):
+                spec = SPECS_BY_NAME.get(f"{active_spec['name']} {class_name}")
+
+        picture_url = None
+        if not isinstance(media, Exception):
+            picture_url = next((asset["value"] for asset in media.get("assets", ()) if asset["key"] == kind), None)
+
+        key = (kind, picture_url, spec and spec.short_name, label, color)
+        if (tile := self.party_tiles.get(key)) is not None:
+            return key, tile
+
+        icon_url = EMOJI_URL.format(id=CLASS_ICONS[spec.short_name]) if spec else None
+        picture, icon = await asyncio.gather(self._download_or_none(picture_url), self._download_or_none(icon_url))
+        return key, TileSource(label=label, color=color, kind=kind, picture=picture, icon=icon)
+
+    async def _download_or_none(self, url: str | None) -> bytes | None:
+        """Download a file through the image cache, or return None if there's no URL or the download fails."""
+        if url is None:
+            return None
+        try:
+            return (await self._get_image_from_url(url)).getvalue()
+        except DownloadError:
+            log.debug("Failed to download %s", url, exc_info=True)
+            return None
+
+    @commands.command(name="cache_stats", aliases=("cache-stats",))
+    @commands.is_owner()
+    async def cache_stats(self, ctx: Context):
+        """Show how well the Battle.net lookup cache and the image cache are doing, and how Battle.net is treating us."""
+        cache = self.battlenet.cache
+        scheduler = self.battlenet.scheduler
+        lookups = "\n".join(f"  {name}: {value}" for name, value in cache.stats.as_dict().items())
+        images = "\n".join(f"  {name}: {value}" for name, value in self.image_cache.stats.as_dict().items())
+        requests = "\n".join(f"  {name}: {value}" for name, value in scheduler.stats.as_dict().items())
+        await ctx.send(
+            f"```\nlookups ({len(cache)}/{cache.max_entries} entries)\n{lookups}\n"
+            f"images\n{images}\n"
+            f"battle.net requests (circuit {'open' if scheduler.breaker.is_open else 'closed'})\n{requests}\n```"
+        )
+
     @commands.command(aliases=['new-main', "newmain"])
     async def new_main(self, ctx: Context, *, class_type: str = commands.parameter(description="A type of class in WoW, like tank or healer.", default="ALL")):
         """
@@ -119,110 +464,63 @@ class Wow(Cog):
             !new_main                # This may return any class
             !new_main dps -mage      # This may only return DPS classes, but no mages        
             !new_main healer druid   # This may return any druid or any healer
+            !new_main holy           # This may return a Holy Paladin or a Holy Priest
         """
 
+        log.debug("Now validating: %s", class_type)
+
         # Only select from classes that match the class type
-        if class_type != "ALL":
+        try:
+            allowed_classes = select_specs(class_type)
+        except ClassFilterError as error:
+            return await ctx.send(f"❌ {error}")
 
-            # Split it up!
-            if ", " in class_type:
-                list_of_specs = class_type.split(", ")
-            elif "," in class_type:
-                list_of_specs = class_type.split(",")
-            else:
-                list_of_specs = class_type.split(" ")
-
-            # Uppercase everything
-            list_of_specs = [spec.upper() for spec in list_of_specs]
-
-            # Fix death knights and demon hunters, which will now be split.
-            if "DEATH" in list_of_specs:
-                list_of_specs.remove("DEATH")
-                list_of_specs.remove("KNIGHT")
-                list_of_specs.append("DEATH KNIGHT")
-
-            if "-DEATH" in list_of_specs:
-                list_of_specs.remove("-DEATH")
-                list_of_specs.remove("KNIGHT")
-                list_of_specs.append("-DEATH KNIGHT")
-
-            if "DEMON" in list_of_specs:
-                list_of_specs.remove("DEMON")
-                list_of_specs.remove("HUNTER")
-                list_of_specs.append("DEMON HUNTER")
-
-            if "-DEMON" in list_of_specs:
-                list_of_specs.remove("-DEMON")
-                list_of_specs.remove("HUNTER")
-                list_of_specs.append("-DEMON HUNTER")
-
-            # Validate data
-            for spec in list_of_specs:
-                print(f"Now validating: {spec}")
-                if (
-                    spec not in ALLOWED_CLASS_TYPES 
-                    and spec not in CLASSES
-                    and spec[1:] not in ALLOWED_CLASS_TYPES
-                    and spec[1:] not in CLASSES
-                ):
-                    return await ctx.send(f"❌ Invalid class type. Please provide something like 'healer', 'tank', 'ranged' or 'hunter'.")
-            
-            # Sort the list of allowed classes so that the exclusions are at the end
-            list_of_specs.sort(key=lambda x: x[0] == "-")
-
-            # If there are only exclusions, we should exclude
-            # them from the full list
-            only_excludes = True
-            for spec in list_of_specs:
-                if spec[0] != "-":
-                    only_excludes = False
-                    break
-            if only_excludes:
-                allowed_classes = ["ALL"]
-            else:
-                allowed_classes = []
-
-            # Create a superset of allowed classes
-            for class_type in list_of_specs:
-                if "ALL" in allowed_classes:
-                    allowed_classes.remove("ALL")
-                    allowed_classes.extend(CLASS_SPECS_FULL)
-                elif class_type in CLASSES:
-                    allowed_classes.extend(CLASS_TO_SPECS[class_type])
-                elif class_type in ALLOWED_CLASS_TYPES:
-                    allowed_classes.extend(globals()[class_type])
-                elif class_type[0] == "-" and class_type[1:] in CLASSES:
-                    allowed_classes = [spec for spec in allowed_classes if spec not in CLASS_TO_SPECS[class_type[1:]]]
-                elif class_type[0] == "-" and class_type[1:] in ALLOWED_CLASS_TYPES:
-                    allowed_classes = [spec for spec in allowed_classes if spec not in globals()[class_type[1:]]]
-                    
-        # If the class type is ALL, just use all classes
-        else:
-            allowed_classes = CLASS_SPECS_FULL
-        
-        # Roll the classes like a slot machine!
-        message = None
-        rolls = random.randint(3, 6)
-        for i in range(rolls):            
-            new_class = await self._get_random_class_spec(allowed_classes)
-            time.sleep(0.075 * (i / 1.85))
-            
-            # During the first iteration, send the message
-            if i == 0: 
-                new_class = f"🎲 {new_class}"
-                message = await ctx.send(content=new_class)  # Returns a Message object
-
-            # On the last iteration, add some celebratory stuff to show we're done
-            elif i == rolls - 1:
-                new_class = f"{new_class}!   🎉🎉🎉"
-                await message.edit(content=new_class)
-
-
-            # For all subsequent iterations, edit the message
-            else:
-                new_class = f"🎲 {new_class}"
-                await message.edit(content=new_class)
+        # Roll the classes like a slot machine! We pick every roll up front,
+        # so the animation itself only has to send and edit the message.
+        rng = RandomStream()
+        rolls = rng.randint(3, 6)
+        frames = [f"🎲 {await self._get_random_class_spec(allowed_classes, rng)}" for _ in range(rolls - 1)]
+
+        # The last roll gets some celebratory stuff to show we're done
+        frames.append(f"{await self._get_random_class_spec(allowed_classes, rng)}!   🎉🎉🎉")
+
+        await self._play_slot_machine(ctx, frames)
+
+    async def _play_slot_machine(self, ctx: Context, frames: list[str]):
+        """
+        Send the first frame, then edit the message through the rest of them.
+
+        Each frame is shown a little longer than the one before it. Discord only lets us
+        edit messages in a channel so often, so if a frame comes up before we're allowed
+        to edit again it's skipped, except for the final frame, which waits its turn.
+        """
+        bucket = self._edit_bucket(ctx.channel.id)
+
+        with DISCORD_LATENCY.labels("send").time():
+            message = await ctx.send(content=frames[0])
+
+        for i, frame in enumerate(frames[1:], start=1):
+            await asyncio.sleep(0.075 * (i / 1.85))
+
+            if i == len(frames) - 1:
+                await bucket.acquire()
+            elif not bucket.try_acquire():
+                continue
+
+            with DISCORD_LATENCY.labels("edit").time():
+                await message.edit(content=frame)
+
+        return message
 
+    def _edit_bucket(self, channel_id: int) -> TokenBucket:
+        """The rate limit for editing messages in a channel, shared by every command that edits as it goes."""
+        bucket = self._edit_buckets.get(channel_id)
+        if bucket is None:
+            # A full bucket is no different from a new one, so forget them, or we'd keep one for every channel ever seen
+            for idle in [channel for channel, other in self._edit_buckets.items() if other.is_full]:
+                del self._edit_buckets[idle]
+            bucket = self._edit_buckets[channel_id] = TokenBucket(EDIT_RATE, EDIT_BURST)
+        return bucket
 
 
 async def setup(bot: Bot) -> None:
@@ -1,46 +1,57 @@
-# List of all classes and specs
-LONGCLASS_TO_SHORTCLASS = {
-    "Havoc Demon Hunter": "dh_havoc",
-    "Vengeance Demon Hunter": "dh_vengeance",
-    "Blood Death Knight": "dk_blood",
-    "Frost Death Knight": "dk_frost",
-    "Unholy Death Knight": "dk_unholy",
-    "Balance Druid": "druid_balance",
-    "Feral Druid": "druid_feral",
-    "Guardian Druid": "druid_guardian",
-    "Restoration Druid": "druid_resto",
-    "Augmentation Evoker": "evoker_augmentation",
-    "Devastation Evoker": "evoker_devastation",
-    "Preservation Evoker": "evoker_preservation",
-    "Beast Mastery Hunter": "hunter_bm",
-    "Marksmanship Hunter": "hunter_mm",
-    "Survival Hunter": "hunter_survival",
-    "Arcane Mage": "mage_arcane",
-    "Fire Mage": "mage_fire",
-    "Frost Mage": "mage_frost",
-    "Brewmaster Monk": "monk_brewmaster",
-    "Mistweaver Monk": "monk_mistweaver",
-    "Windwalker Monk": "monk_ww",
-    "Holy Paladin": "paladin_holy",
-    "Protection Paladin": "paladin_protection",
-    "Retribution Paladin": "paladin_ret",
-    "Discipline Priest": "priest_disc",
-    "Holy Priest": "priest_holy",
-    "Shadow Priest": "priest_shadow",
-    "Assassination Rogue": "rogue_assa",
-    "Outlaw Rogue": "rogue_outlaw",
-    "Subtlety Rogue": "rogue_sub",
-    "Elemental Shaman": "shaman_elem",
-    "Enhancement Shaman": "shaman_enhancement",
-    "Restoration Shaman": "shaman_resto",
-    "Affliction Warlock": "warlock_affli",
-    "Demonology Warlock": "warlock_demono",
-    "Destruction Warlock": "warlock_destru",
-    "Arms Warrior": "warrior_arms",
-    "Fury Warrior": "warrior_fury",
-    "Protection Warrior": "warrior_prot",
-}
+import typing as t
+
+# Roles, and for damage dealers, whether they fight up close or from afar
+TANK = "TANK"
+HEALER = "HEALER"
+DPS = "DPS"
+MELEE = "MELEE"
+RANGED = "RANGED"
 
+# Every class and spec in the game. Specs are numbered in this order.
+#  (class, spec, icon name, role, range)
+SPEC_TABLE = (
+    ("Death Knight", "Blood", "dk_blood", TANK, None),
+    ("Death Knight", "Frost", "dk_frost", DPS, MELEE),
+    ("Death Knight", "Unholy", "dk_unholy", DPS, MELEE),
+    ("Demon Hunter", "Havoc", "dh_havoc", DPS, MELEE),
+    ("Demon Hunter", "Vengeance", "dh_vengeance", TANK, None),
+    ("Druid", "Balance", "druid_balance", DPS, RANGED),
+    ("Druid", "Feral", "druid_feral", DPS, MELEE),
+    ("Druid", "Guardian", "druid_guardian", TANK, None),
+    ("Druid", "Restoration", "druid_resto", HEALER, None),
+    ("Evoker", "Devastation", "evoker_devastation", DPS, RANGED),
+    ("Evoker", "Preservation", "evoker_preservation", HEALER, None),
+    ("Evoker", "Augmentation", "evoker_augmentation", DPS, RANGED),
+    ("Hunter", "Beast Mastery", "hunter_bm", DPS, RANGED),
+    ("Hunter", "Marksmanship", "hunter_mm", DPS, RANGED),
+    ("Hunter", "Survival", "hunter_survival", DPS, MELEE),
+    ("Mage", "Arcane", "mage_arcane", DPS, RANGED),
+    ("Mage", "Fire", "mage_fire", DPS, RANGED),
+    ("Mage", "Frost", "mage_frost", DPS, RANGED),
+    ("Monk", "Brewmaster", "monk_brewmaster", TANK, None),
+    ("Monk", "Mistweaver", "monk_mistweaver", HEALER, None),
+    ("Monk", "Windwalker", "monk_ww", DPS, MELEE),
+    ("Paladin", "Holy", "paladin_holy", HEALER, None),
+    ("Paladin", "Protection", "paladin_protection", TANK, None),
+    ("Paladin", "Retribution", "paladin_ret", DPS, MELEE),
+    ("Priest", "Discipline", "priest_disc", HEALER, None),
+    ("Priest", "Holy", "priest_holy", HEALER, None),
+    ("Priest", "Shadow", "priest_shadow", DPS, RANGED),
+    ("Rogue", "Assassination", "rogue_assa", DPS, MELEE),
+    ("Rogue", "Outlaw", "rogue_outlaw", DPS, MELEE),
+    ("Rogue", "Subtlety", "rogue_sub", DPS, MELEE),
+    ("Shaman", "Elemental", "shaman_elem", DPS, RANGED),
+    ("Shaman", "Enhancement", "shaman_enhancement", DPS, MELEE),
+    ("Shaman", "Restoration", "shaman_resto", HEALER, None),
+    ("Warlock", "Affliction", "warlock_affli", DPS, RANGED),
+    ("Warlock", "Demonology", "warlock_demono", DPS, RANGED),
+    ("Warlock", "Destruction", "warlock_destru", DPS, RANGED),
+    ("Warrior", "Arms", "warrior_arms", DPS, MELEE),
+    ("Warrior", "Fury", "warrior_fury", DPS, MELEE),
+    ("Warrior", "Protection", "warrior_prot", TANK, None),
+)
+
+# The Discord emoji ID for every icon name in the table above, plus the treat icon.
 CLASS_ICONS = {
     "dh_havoc":"1254379358664130580",
     "dh_vengeance":"1254379360090325072",
@@ -84,250 +95,110 @@ CLASS_ICONS = {
     "treat":"1249357314834698261",
 }
 
-CLASS_BREAKDOWN = {
-    "Blood Death Knight": ("Death Knight", "Blood"),
-    "Frost Death Knight": ("Death Knight", "Frost"),
-    "Unholy Death Knight": ("Death Knight", "Unholy"),
-    "Havoc Demon Hunter": ("Demon Hunter", "Havoc"),
-    "Vengeance Demon Hunter": ("Demon Hunter", "Vengeance"),
-    "Balance Druid": ("Druid", "Balance"),
-    "Feral Druid": ("Druid", "Feral"),
-    "Guardian Druid": ("Druid", "Guardian"),
-    "Restoration Druid": ("Druid", "Restoration"),
-    "Devastation Evoker": ("Evoker", "Devastation"),
-    "Preservation Evoker": ("Evoker", "Preservation"),
-    "Augmentation Evoker": ("Evoker", "Augmentation"),
-    "Beast Mastery Hunter": ("Hunter", "Beast Mastery"),
-    "Marksmanship Hunter": ("Hunter", "Marksmanship"),
-    "Survival Hunter": ("Hunter", "Survival"),
-    "Arcane Mage": ("Mage", "Arcane"),
-    "Fire Mage": ("Mage", "Fire"),
-    "Frost Mage": ("Mage", "Frost"),
-    "Brewmaster Monk": ("Monk", "Brewmaster"),
-    "Mistweaver Monk": ("Monk", "Mistweaver"),
-    "Windwalker Monk": ("Monk", "Windwalker"),
-    "Holy Paladin": ("Paladin", "Holy"),
-    "Protection Paladin": ("Paladin", "Protection"),
-    "Retribution Paladin": ("Paladin", "Retribution"),
-    "Discipline Priest": ("Priest", "Discipline"),
-    "Holy Priest": ("Priest", "Holy"),
-    "Shadow Priest": ("Priest", "Shadow"),
-    "Assassination Rogue": ("Rogue", "Assassination"),
-    "Outlaw Rogue": ("Rogue", "Outlaw"),
-    "Subtlety Rogue": ("Rogue", "Subtlety"),
-    "Elemental Shaman": ("Shaman", "Elemental"),
-    "Enhancement Shaman": ("Shaman", "Enhancement"),
-    "Restoration Shaman": ("Shaman", "Restoration"),
-    "Affliction Warlock": ("Warlock", "Affliction"),
-    "Demonology Warlock": ("Warlock", "Demonology"),
-    "Destruction Warlock": ("Warlock", "Destruction"),
-    "Arms Warrior": ("Warrior", "Arms"),
-    "Fury Warrior": ("Warrior", "Fury"),
-    "Protection Warrior": ("Warrior", "Protection"),
+# The color each class's name is shown in, like on the in-game raid frames
+CLASS_COLORS = {
+    "Death Knight": "#C41E3A",
+    "Demon Hunter": "#A330C9",
+    "Druid": "#FF7C0A",
+    "Evoker": "#33937F",
+    "Hunter": "#AAD372",
+    "Mage": "#3FC7EB",
+    "Monk": "#00FF98",
+    "Paladin": "#F48CBA",
+    "Priest": "#FFFFFF",
+    "Rogue": "#FFF468",
+    "Shaman": "#0070DD",
+    "Warlock": "#8788EE",
+    "Warrior": "#C69B6D",
 }
 
-TANK = [
-    "Blood Death Knight",
-    "Vengeance Demon Hunter",
-    "Guardian Druid",
-    "Brewmaster Monk",
-    "Protection Paladin",
-    "Protection Warrior"
-]
 
-HEALER = [
-    "Restoration Druid",
-    "Preservation Evoker",
-    "Mistweaver Monk",
-    "Holy Paladin",
-    "Discipline Priest",
-    "Holy Priest",
-    "Restoration Shaman"
-]
+class Spec(t.NamedTuple):
+    """A single class specialization, e.g. Blood Death Knight."""
+
+    id: int
+    class_name: str  # e.g. "Death Knight"
+    spec_name: str  # e.g. "Blood"
+    name: str  # e.g. "Blood Death Knight"
+    short_name: str  # e.g. "dk_blood"
+    role: str  # TANK, HEALER or DPS
+    range: str | None  # MELEE or RANGED for damage dealers, otherwise None
+    icon: str  # The rendered Discord emoji, e.g. "<:dk_blood:1254379361352683583>"
+    label: str  # The icon and name, as shown when rolling a new main
+
+    @property
+    def mask(self) -> int:
+        """This spec's bit in a spec bitmask."""
+        return 1 << self.id
+
+
+def _build_spec(id: int, class_name: str, spec_name: str, short_name: str, role: str, range: str | None) -> Spec:
+    icon = f"<:{short_name}:{CLASS_ICONS[short_name]}>"
+    return Spec(
+        id=id,
+        class_name=class_name,
+        spec_name=spec_name,
+        name=f"{spec_name} {class_name}",
+        short_name=short_name,
+        role=role,
+        range=range,
+        icon=icon,
+        label=f"{icon}   **{spec_name}** {class_name}",
+    )
+
+
+def _check_tables() -> None:
+    """Make sure the spec, icon and color tables agree with each other, and with themselves."""
+    names = [f"{spec_name} {class_name}" for class_name, spec_name, *_ in SPEC_TABLE]
+    short_names = [short_name for _, _, short_name, *_ in SPEC_TABLE]
+
+    problems = []
+    if len(set(names)) != len(names):
+        problems.append("a spec is listed more than once")
+    if len(set(short_names)) != len(short_names):
+        problems.append("an icon name is used by more than one spec")
+    if missing := set(short_names) - CLASS_ICONS.keys():
+        problems.append(f"these specs have no icon: {sorted(missing)}")
+    if unused := CLASS_ICONS.keys() - set(short_names) - {"treat"}:
+        problems.append(f"these icons don't belong to a spec: {sorted(unused)}")
+    if not all(icon_id.isdecimal() for icon_id in CLASS_ICONS.values()):
+        problems.append("every icon ID should be a number")
+    if uncolored := {class_name for class_name, *_ in SPEC_TABLE} - CLASS_COLORS.keys():
+        problems.append(f"these classes have no color: {sorted(uncolored)}")
+
+    for class_name, spec_name, _, role, range in SPEC_TABLE:
+        if role not in (TANK, HEALER, DPS):
+            problems.append(f"{spec_name} {class_name} has an unknown role: {role}")
+        elif (role == DPS) != (range in (MELEE, RANGED)):
+            problems.append(f"{spec_name} {class_name} should have a range if, and only if, it's a DPS spec")
+
+    if problems:
+        raise ValueError("The WoW spec tables disagree: " + "; ".join(problems))
+
+
+_check_tables()
 
-DPS = [
-    "Frost Death Knight",
-    "Unholy Death Knight",
-    "Havoc Demon Hunter",
-    "Balance Druid",
-    "Feral Druid",
-    "Devastation Evoker",
-    "Augmentation Evoker",
-    "Beast Mastery Hunter",
-    "Marksmanship Hunter",
-    "Survival Hunter",
-    "Arcane Mage",
-    "Fire Mage",
-    "Frost Mage",
-    "Windwalker Monk",
-    "Retribution Paladin",
-    "Shadow Priest",
-    "Assassination Rogue",
-    "Outlaw Rogue",
-    "Subtlety Rogue",
-    "Elemental Shaman",
-    "Enhancement Shaman",
-    "Affliction Warlock",
-    "Demonology Warlock",
-    "Destruction Warlock",
-    "Arms Warrior",
-    "Fury Warrior"
-]
+# Every spec, indexed by its ID
+SPECS = tuple(_build_spec(id, *row) for id, row in enumerate(SPEC_TABLE))
+SPECS_BY_NAME = {spec.name: spec for spec in SPECS}
 
-MELEE = [
-    "Frost Death Knight",
-    "Unholy Death Knight",
-    "Havoc Demon Hunter",
-    "Feral Druid",
-    "Windwalker Monk",
-    "Retribution Paladin",
-    "Assassination Rogue",
-    "Outlaw Rogue",
-    "Subtlety Rogue",
-    "Enhancement Shaman",
-    "Survival Hunter",
-    "Arms Warrior",
-    "Fury Warrior"
-]
+TREAT_ICON = f"<:treat:{CLASS_ICONS['treat']}>"
 
-RANGED = [
-    "Balance Druid",
-    "Devastation Evoker",
-    "Augmentation Evoker",
-    "Beast Mastery Hunter",
-    "Marksmanship Hunter",
-    "Arcane Mage",
-    "Fire Mage",
-    "Frost Mage",
-    "Shadow Priest",
-    "Elemental Shaman",
-    "Affliction Warlock",
-    "Demonology Warlock",
-    "Destruction Warlock"
-]
+# Bitmasks of specs, by role, by range and by class. For example, `ROLE_MASKS[TANK] & CLASS_MASKS["DRUID"]`
+# is the mask of every druid tank spec.
+ALL_MASK = (1 << len(SPECS)) - 1
+ROLE_MASKS = {TANK: 0, HEALER: 0, DPS: 0, MELEE: 0, RANGED: 0}
+CLASS_MASKS: dict[str, int] = {}
+for _spec in SPECS:
+    ROLE_MASKS[_spec.role] |= _spec.mask
+    if _spec.range:
+        ROLE_MASKS[_spec.range] |= _spec.mask
+    CLASS_MASKS[_spec.class_name.upper()] = CLASS_MASKS.get(_spec.class_name.upper(), 0) | _spec.mask
+del _spec
 
-CLASS_SPECS_FULL = [
-    "Blood Death Knight",
-    "Frost Death Knight",
-    "Unholy Death Knight",
-    "Havoc Demon Hunter",
-    "Vengeance Demon Hunter",
-    "Balance Druid",
-    "Feral Druid",
-    "Guardian Druid",
-    "Restoration Druid",
-    "Devastation Evoker",
-    "Preservation Evoker",
-    "Augmentation Evoker",
-    "Beast Mastery Hunter",
-    "Marksmanship Hunter",
-    "Survival Hunter",
-    "Arcane Mage",
-    "Fire Mage",
-    "Frost Mage",
-    "Brewmaster Monk",
-    "Mistweaver Monk",
-    "Windwalker Monk",
-    "Holy Paladin",
-    "Protection Paladin",
-    "Retribution Paladin",
-    "Discipline Priest",
-    "Holy Priest",
-    "Shadow Priest",
-    "Assassination Rogue",
-    "Outlaw Rogue",
-    "Subtlety Rogue",
-    "Elemental Shaman",
-    "Enhancement Shaman",
-    "Restoration Shaman",
-    "Affliction Warlock",
-    "Demonology Warlock",
-    "Destruction Warlock",
-    "Arms Warrior",
-    "Fury Warrior",
-    "Protection Warrior"
-]
+CLASSES = tuple(CLASS_MASKS)
 
-CLASSES = [
-    "DEATH KNIGHT",
-    "DEMON HUNTER",
-    "DRUID",
-    "EVOKER",
-    "HUNTER",
-    "MAGE",
-    "MONK",
-    "PALADIN",
-    "PRIEST",
-    "ROGUE",
-    "SHAMAN",
-    "WARLOCK",
-    "WARRIOR"
-]
 
-CLASS_TO_SPECS = {
-    "DEATH KNIGHT": [
-        "Blood Death Knight",
-        "Frost Death Knight",
-        "Unholy Death Knight"
-    ],
-    "DEMON HUNTER": [
-        "Havoc Demon Hunter",
-        "Vengeance Demon Hunter"
-    ],
-    "DRUID": [
-        "Balance Druid",
-        "Feral Druid",
-        "Guardian Druid",
-        "Restoration Druid"
-    ],
-    "EVOKER": [
-        "Devastation Evoker",
-        "Preservation Evoker",
-        "Augmentation Evoker"
-    ],
-    "HUNTER": [
-        "Beast Mastery Hunter",
-        "Marksmanship Hunter",
-        "Survival Hunter"
-    ],
-    "MAGE": [
-        "Arcane Mage",
-        "Fire Mage",
-        "Frost Mage"
-    ],
-    "MONK": [
-        "Brewmaster Monk",
-        "Mistweaver Monk",
-        "Windwalker Monk"
-    ],
-    "PALADIN": [
-        "Holy Paladin",
-        "Protection Paladin",
-        "Retribution Paladin"
-    ],
-    "PRIEST": [
-        "Discipline Priest",
-        "Holy Priest",
-        "Shadow Priest"
-    ],
-    "ROGUE": [
-        "Assassination Rogue",
-        "Outlaw Rogue",
-        "Subtlety Rogue"
-    ],
-    "SHAMAN": [
-        "Elemental Shaman",
-        "Enhancement Shaman",
-        "Restoration Shaman"
-    ],
-    "WARLOCK": [
-        "Affliction Warlock",
-        "Demonology Warlock",
-        "Destruction Warlock"
-    ],
-    "WARRIOR": [
-        "Arms Warrior",
-        "Fury Warrior",
-        "Protection Warrior"
-    ]
-}
\ No newline at end of file
+def specs_in(mask: int) -> tuple[Spec, ...]:
+    """Return every spec in a bitmask, in ID order."""
+    return tuple(spec for spec in SPECS if mask >> spec.id & 1)
@@ -1,22 +1,21 @@
 import asyncio
-import logging
-import sys
 import os
 
 from discord import Intents, Game, AllowedMentions
 from discord.ext import commands
 
+from utils.extensions import load_extensions
+from utils.log import setup_logging
+from utils.memory import cache_options
+from utils.resources import get_resources
+
 # This token must exist in the environment variables for Railway.
 DISCORD_TOKEN = os.environ["DISCORD_TOKEN"]
 
-# Set up logging so we will see logs in the console
-root = logging.getLogger()
-root.setLevel(logging.DEBUG)
-handler = logging.StreamHandler(sys.stdout)
-handler.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-root.addHandler(handler)
+# Set up logging so we will see logs in the console. Records are written from a
+# background thread, so logging never blocks the bot. See utils/log.py for the
+# environment variables that control it.
+log_listener = setup_logging()
 
 # This is how we tell Discord that we want certain data streams,
 # in this case, we want to hear events related to message content
@@ -31,22 +30,24 @@ bot = commands.Bot(
     intents=intents,
     activity=Game(name="games with your heart"),  # "Playing games with your heart"
     case_insensitive=True,
-    max_messages=10_000,
+    # How many messages and members to keep in memory, see utils/memory.py
+    **cache_options(),
     allowed_mentions=AllowedMentions(everyone=False, roles=False, users=True),  # Never let the bot mention @everyone or @roles
 )
 
-async def load_extensions():
-    """Load all the extensions in the /cogs folder."""
-    for filename in os.listdir("./cogs"):
-        if filename.endswith(".py"):
-
-            # cut off the .py from the file name
-            await bot.load_extension(f"cogs.{filename[:-3]}")
-
 # Run the bot!
 async def main():
-    async with bot:
-        await load_extensions()
-        await bot.start(DISCORD_TOKEN)
+    try:
+        async with bot:
+            # Loads every cog in the /cogs folder, or just the ones picked with
+            # COGS_ENABLED and COGS_DISABLED. See utils/extensions.py.
+            await load_extensions(bot)
+            await bot.start(DISCORD_TOKEN)
+    finally:
+        # Close the sessions and worker pools the cogs have been sharing
+        await get_resources(bot).close()
+
+        # Flush anything that's still waiting to be logged
+        log_listener.stop()
 
 asyncio.run(main())
\ No newline at end of file
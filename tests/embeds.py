@@ -0,0 +1,62 @@
+"""
+Embeds to test and benchmark uwuifying with, and the old embed conversion to check the batched one against.
+
+These live with the tests, since the equivalence tests depend on them staying exactly
+as they are. The benchmarks import them from here too.
+"""
+from discord import Embed
+
+# Discord's limits for a single embed
+MAX_FIELDS = 25
+MAX_TITLE = 256
+MAX_FIELD_NAME = 256
+MAX_FOOTER = 2048
+MAX_TOTAL = 6000
+
+SAMPLE = (
+    "Hello there! Would you like a small cup of tea? I really love the Roar of the crowd, "
+    "and what a lovely night it is. Nobody knows what the Naga are plotting.\n"
+)
+
+
+def sample_text(length: int) -> str:
+    """Repeat the sample text until it's `length` characters long."""
+    return (SAMPLE * (length // len(SAMPLE) + 1))[:length]
+
+
+def max_size_embed() -> Embed:
+    """An embed with every field filled in, as big as Discord allows in total."""
+    embed = Embed(title=sample_text(MAX_TITLE))
+    embed.set_footer(text=sample_text(200))
+    for _ in range(MAX_FIELDS):
+        embed.add_field(name=sample_text(40), value=sample_text(150))
+    embed.description = sample_text(MAX_TOTAL - len(embed))
+    return embed
+
+
+def many_fields_embed() -> Embed:
+    """An embed with as many short fields as Discord allows, where per-call overhead dominates."""
+    embed = Embed(title="Raid roster", description="Who's coming tonight?")
+    embed.set_footer(text="Sign up in #raids")
+    for i in range(MAX_FIELDS):
+        embed.add_field(name=f"Slot {i}", value="Lord Nanners")
+    return embed
+
+
+def legacy_convert(func, embed: Embed) -> Embed:
+    """The embed conversion as it was before, one pipeline run per segment."""
+    embed_dict = embed.to_dict()
+
+    embed_dict["title"] = func(embed_dict.get("title", ""))
+    embed_dict["description"] = func(embed_dict.get("description", ""))
+
+    if "footer" in embed_dict:
+        embed_dict["footer"] = {**embed_dict["footer"], "text": func(embed_dict["footer"].get("text", ""))}
+
+    if "fields" in embed_dict:
+        embed_dict["fields"] = [
+            {**field, "name": func(field.get("name", "")), "value": func(field.get("value", ""))}
+            for field in embed_dict["fields"]
+        ]
+
+    return Embed.from_dict(embed_dict)
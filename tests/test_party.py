@@ -0,0 +1,45 @@
+"""Checks `!party` tiles are still drawn when what was downloaded for them isn't an image."""
+import io
+
+import pytest
+from PIL import Image
+
+from utils.party import ICON_SIZE, LABEL_HEIGHT, MISSING_PICTURE, PICTURE_SIZES, TileSource, render_party, render_tile
+
+GARBAGE = (
+    b"",
+    b"<html><body>502 Bad Gateway</body></html>",
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR",  # A PNG cut off in its header
+)
+
+
+def png(size: tuple[int, int], color: tuple[int, ...], mode: str = "RGB") -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("garbage", GARBAGE)
+def test_undecodable_picture_is_drawn_as_missing(garbage):
+    icon = png((ICON_SIZE, ICON_SIZE), (255, 0, 0, 255), "RGBA")
+    tile = Image.open(io.BytesIO(render_tile(TileSource("Lemon", "#C69B6D", picture=garbage, icon=icon))))
+
+    width, height = PICTURE_SIZES["inset"]
+    assert tile.size == (width, height + LABEL_HEIGHT)
+    assert tile.getpixel((width - 1, height - 1)) == MISSING_PICTURE
+    # The icon still goes in the corner
+    assert tile.getpixel((3 + ICON_SIZE // 2, 3 + ICON_SIZE // 2)) == (255, 0, 0)
+
+
+@pytest.mark.parametrize("garbage", GARBAGE)
+def test_undecodable_icon_is_left_out(garbage):
+    picture = png((230, 116), (0, 0, 255))
+    tile = Image.open(io.BytesIO(render_tile(TileSource("Lemon", "#C69B6D", picture=picture, icon=garbage))))
+    assert tile.getpixel((3 + ICON_SIZE // 2, 3 + ICON_SIZE // 2)) == (0, 0, 255)
+
+
+def test_party_with_garbage_downloads():
+    sources = [TileSource("Lemon", "#C69B6D", picture=b"not an image", icon=b"nor this"), TileSource("Nanners", "#FFFFFF")]
+    rendered, grid = render_party(sources)
+    assert len(rendered) == 2
+    assert Image.open(io.BytesIO(grid)).format == "PNG"
@@ -0,0 +1,27 @@
+"""Checks which modules the reloader watches, going by the real cogs' imports."""
+from types import SimpleNamespace
+
+from utils.reloader import ROOT, STATEFUL_UTILS, Reloader
+
+
+def reloader(*extensions: str) -> Reloader:
+    modules = {name: SimpleNamespace(__file__=ROOT / f"{name.replace('.', '/')}.py") for name in extensions}
+    return Reloader(SimpleNamespace(extensions=modules))
+
+
+def test_follows_imports_into_utils():
+    watched = reloader("cogs.uwu").watched()
+    assert {"cogs.uwu", "utils.uwu", "constants.warcraft"} <= watched.keys()
+
+
+def test_never_reloads_stateful_utils():
+    watched = reloader("cogs.uwu", "cogs.wow", "cogs.stats", "cogs.reload").watched()
+    assert not watched.keys() & STATEFUL_UTILS
+    # utils.uwu imports it, but it holds the shared generator and registers a fork hook when it's run
+    assert "utils.rng" not in watched
+
+
+def test_plan_reloads_dependents_first_to_last():
+    order = reloader("cogs.uwu").plan({"utils.uwu"})
+    assert order.index("utils.uwu") < order.index("cogs.uwu")
+    assert "utils.rng" not in order
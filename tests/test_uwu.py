@@ -0,0 +1,165 @@
+"""
+Checks the fused uwuify against running each stage one after the other, on seeded random text.
+
+Run with:
+    python -m pytest tests
+"""
+import asyncio
+import copy
+import random
+from functools import partial
+from types import SimpleNamespace
+
+import discord
+import pytest
+from discord import Embed
+
+from cogs.uwu import Uwu, convert_embed
+from tests.embeds import legacy_convert, many_fields_embed, max_size_embed
+from utils.resources import get_resources
+from utils.rng import RandomStream
+from utils.uwu import PUNCTUATION_MARKER, SEGMENT_SEPARATOR, WORD_REPLACE, EmojiIndex, UwuTransformer
+
+SEEDS = range(200)
+
+KNOWN_EMOJI = 123456789012345678
+UNKNOWN_EMOJI = 876543210987654321
+
+# Weighted towards what the stages look for: words to replace, n's before vowels, l's and
+# r's next to w's, whitespace before letters and punctuation, and custom emoji.
+PIECES = (
+    *WORD_REPLACE,
+    *"nnaeiouylrwLRWN ",
+    "  ",
+    *".!?\r\n\t",
+    "nan",
+    "nanu",
+    "wl",
+    "rw",
+    "Lovely",
+    "Hello there",
+    "123",
+    "é",
+    f"<:known:{KNOWN_EMOJI}>",
+    f"<a:unknown:{UNKNOWN_EMOJI}>",
+    "<:broken:12>",
+)
+
+
+def random_text(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(PIECES) for _ in range(length))
+
+
+def embed_text(embed: Embed) -> dict:
+    """Everything in an embed, with a missing title or description the same as an empty one, like Discord shows them."""
+    data = embed.to_dict()
+    for key in ("title", "description"):
+        data[key] = data.get(key) or ""
+    return data
+
+
+@pytest.fixture(scope="module", params=[False, True], ids=["substrings", "whole words"])
+def transformer(request) -> UwuTransformer:
+    return UwuTransformer(EmojiIndex([KNOWN_EMOJI]), whole_words=request.param)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_uwuify_matches_stages(transformer, seed):
+    text = random_text(random.Random(seed), seed % 60)
+    assert transformer.uwuify(text, rng=RandomStream(seed)) == transformer.uwuify_in_stages(text, rng=RandomStream(seed))
+
+
+@pytest.mark.parametrize("marker", [PUNCTUATION_MARKER, SEGMENT_SEPARATOR])
+def test_uwuify_with_markers_in_the_text(transformer, marker):
+    text = f"hello{marker} there. what{marker}{marker} a lovely night!"
+    assert transformer.uwuify(text, rng=RandomStream(0)) == transformer.uwuify_in_stages(text, rng=RandomStream(0))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_uwuify_many_matches_uwuify(transformer, seed):
+    rng = random.Random(seed)
+    texts = [random_text(rng, rng.randrange(30)) for _ in range(rng.randrange(1, 8))]
+    if seed % 4 == 0:
+        # Without custom emoji, so the strings really are scanned together
+        texts = [text.replace("<", "") for text in texts]
+
+    stream = RandomStream(seed)
+    expected = [transformer.uwuify_in_stages(text, rng=stream) for text in texts]
+    assert transformer.uwuify_many(texts, rng=RandomStream(seed)) == expected
+
+
+def random_embed(rng: random.Random) -> Embed:
+    embed = Embed(
+        title=random_text(rng, 10) if rng.random() < 0.8 else None,
+        description=random_text(rng, 40) if rng.random() < 0.8 else None,
+        url="https://example.com/lovely",
+    )
+    if rng.random() < 0.7:
+        embed.set_footer(text=random_text(rng, 10), icon_url="https://example.com/icon.png")
+    for _ in range(rng.randrange(5)):
+        embed.add_field(name=random_text(rng, 5), value=random_text(rng, 20), inline=rng.random() < 0.5)
+    return embed
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_convert_embed_matches_legacy(transformer, seed):
+    rng = random.Random(seed)
+    embed = random_embed(rng)
+    if seed % 4 == 0:
+        embed = copy.deepcopy(max_size_embed() if seed % 8 else many_fields_embed())
+    extra = random_text(rng, 30)
+    before = copy.deepcopy(embed.to_dict())
+
+    stream = RandomStream(seed)
+    expected = legacy_convert(partial(transformer.uwuify_in_stages, rng=stream), embed)
+    expected_extra = transformer.uwuify_in_stages(extra, rng=stream)
+    assert embed.to_dict() == before
+
+    patched, converted = convert_embed(partial(transformer.uwuify_many, rng=RandomStream(seed)), embed, extra)
+    assert embed_text(patched) == embed_text(expected)
+    assert converted == [expected_extra]
+
+    # The original is left exactly as it was, footer and fields included
+    assert embed.to_dict() == before
+    assert patched is not embed
+
+
+def replied_to(content: str, embeds: list[Embed]) -> SimpleNamespace:
+    """A context for `!uwu` sent as a reply to a message, in a DM, which keeps everything sent back."""
+    message = discord.Message.__new__(discord.Message)
+    message.content = content
+    message.embeds = embeds
+
+    sent = []
+
+    async def send(**kwargs) -> None:
+        sent.append(kwargs)
+
+    return SimpleNamespace(
+        author=SimpleNamespace(id=1),
+        guild=None,
+        message=SimpleNamespace(reference=SimpleNamespace(resolved=message), mentions=(), role_mentions=()),
+        send=send,
+        sent=sent,
+    )
+
+
+def test_uwu_replying_to_an_image_only_embed():
+    embed = Embed()
+    embed.set_image(url="https://example.com/lovely.png")
+    ctx = replied_to("", [embed])
+    bot = SimpleNamespace(emojis=())
+
+    async def run():
+        cog = Uwu(bot)
+        await cog.cog_load()
+        try:
+            await Uwu.uwu_command.callback(cog, ctx)
+        finally:
+            await get_resources(bot).close()
+
+    asyncio.run(run())
+    # An embed with no text in it is still sent back, rather than an empty message
+    [reply] = ctx.sent
+    assert reply["content"] is None
+    assert reply["embed"].image.url == "https://example.com/lovely.png"
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import time
+
+import aiohttp
+from aiowowapi import WowApi
+from aiowowapi.retail.retail import RetailApi
+
+from utils.cache import TTLCache
+from utils.metrics import UPSTREAM_LATENCY, endpoint_label
+from utils.scheduler import Priority, RequestScheduler, UpstreamUnavailable, request_priority
+
+log = logging.getLogger(__name__)
+
+
+class BattleNetClient(WowApi):
+    """
+    A long-lived WowApi client for a single region.
+
+    Unlike a plain `WowApi` context, this keeps one aiohttp session with a bounded
+    connection pool open for its whole lifetime, and reuses its OAuth access token
+    across requests. The token is refreshed in the background shortly before it
+    expires, so commands don't have to wait on the token exchange.
+
+    Every request goes through `scheduler`, which keeps us inside Blizzard's quotas,
+    retries what's worth retrying, and fails fast while Battle.net is down.
+
+    Set `base_url` to send both API and OAuth requests somewhere other than Blizzard,
+    e.g. the fake Battle.net in `benchmarks/fake_battlenet.py`.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        region: str,
+        *,
+        max_connections: int = 10,
+        token_refresh_margin: float = 300,
+        scheduler: RequestScheduler | None = None,
+        base_url: str | None = None,
+    ):
+        super().__init__(client_id, client_secret, region, max_parallel_requests=max_connections, request_debugging=True)
+
+        # WowApi hands its endpoint groups a super() proxy, which would skip the
+        # overrides below, so we point them back at ourselves.
+        self.Retail = RetailApi(self)
+
+        self._auth = aiohttp.BasicAuth(client_id, client_secret)
+        self._max_connections = max_connections
+        self._token_refresh_margin = token_refresh_margin
+        self.scheduler = scheduler or RequestScheduler()
+        self._hostname = base_url.rstrip("/") + "{api_endpoint}" if base_url else None
+        self._session: aiohttp.ClientSession | None = None
+
+        self._token: str | None = None
+        self._token_expires = 0.0
+        self._token_lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "BattleNetClient":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        """Open the pooled HTTP session."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._max_connections)
+            self._session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self) -> None:
+        """Cancel any pending token refresh and close the HTTP session."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def get_hostname(self) -> str:
+        return self._hostname or super().get_hostname()
+
+    def get_oauth_hostname(self) -> str:
+        return self._hostname or super().get_oauth_hostname()
+
+    async def get_access_token(self) -> str:
+        """
+        Return a valid access token, fetching a new one only when necessary.
+
+        Once the token is within `token_refresh_margin` seconds of expiring, we keep
+        handing out the current one and refresh it in the background.
+        """
+        now = time.monotonic()
+
+        if self._token is None or now >= self._token_expires:
+            async with self._token_lock:
+                if self._token is None or time.monotonic() >= self._token_expires:
+                    await self._refresh_token()
+
+        elif now >= self._token_expires - self._token_refresh_margin and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._background_refresh())
+
+        return self._token
+
+    async def _background_refresh(self) -> None:
+        """Refresh the access token without blocking whoever asked for it."""
+        try:
+            async with self._token_lock:
+                with request_priority(Priority.BACKGROUND):
+                    await self._refresh_token()
+        except Exception:
+            log.exception("Failed to refresh the Battle.net access token for %s", self.get_region())
+        finally:
+            self._refresh_task = None
+
+    async def _refresh_token(self) -> None:
+        """Exchange our client credentials for a new access token."""
+        data = await self.get_resource(
+            self.get_oauth_hostname(),
+            "/oauth/token",
+            {"grant_type": "client_credentials"},
+            auth=self._auth,
+            method="POST",
+        )
+        self._token = data["access_token"]
+        self._token_expires = time.monotonic() + data["expires_in"]
+        log.debug("Refreshed the Battle.net access token for %s", self.get_region())
+
+    async def get_resource(
+        self,
+        hostname: str,
+        api_endpoint: str,
+        params: dict | None = None,
+        auth: aiohttp.BasicAuth | None = None,
+        method: str = "GET",
+    ) -> dict:
+        """Make a request on the pooled session, once the scheduler allows it, and return the JSON response."""
+        await self.start()
+        return await self.scheduler.run(lambda: self._request(hostname, api_endpoint, params, auth, method))
+
+    async def _request(
+        self,
+        hostname: str,
+        api_endpoint: str,
+        params: dict | None,
+        auth: aiohttp.BasicAuth | None,
+        method: str,
+    ) -> dict:
+        """Make a single attempt at a request."""
+        with UPSTREAM_LATENCY.labels("battlenet", endpoint_label(api_endpoint)).time():
+            async with self._session.request(
+                method,
+                hostname.format(api_endpoint=api_endpoint),
+                params=params,
+                auth=auth,
+            ) as response:
+                response.raise_for_status()
+                return await response.json()
+
+
+class BattleNet:
+    """
+    Hands out one shared `BattleNetClient` per region.
+
+    Character and guild lookups made through this class are cached per
+    (region, realm, name, endpoint), each endpoint with its own time-to-live. If
+    Battle.net is down, lookups that expired within the last `max_stale` seconds are
+    answered from the cache anyway. Every region shares one request scheduler, since
+    Blizzard's quotas are per client rather than per region.
+    """
+
+    # How many seconds to keep each kind of character lookup around for.
+    CACHE_TTLS = {
+        "character-media": 15 * 60,
+        "character-profile": 5 * 60,
+        "guild-roster": 10 * 60,
+    }
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        *,
+        cache_size: int = 1024,
+        cache_ttls: dict[str, float] | None = None,
+        max_stale: float = 60 * 60,
+        **client_options,
+    ):
+        self._client_id = client_id
+        self._client_secret = client_secret
+        self._client_options = client_options
+        self._clients: dict[str, BattleNetClient] = {}
+        self.scheduler = RequestScheduler()
+
+        self.cache = TTLCache(max_entries=cache_size, max_stale=max_stale)
+        self.cache_ttls = {**self.CACHE_TTLS, **(cache_ttls or {})}
+
+    def client(self, region: str) -> BattleNetClient:
+        """Get the client for a region, creating it the first time it's asked for."""
+        region = region.lower()
+        if region not in self._clients:
+            self._clients[region] = BattleNetClient(
+                self._client_id, self._client_secret, region, scheduler=self.scheduler, **self._client_options
+            )
+        return self._clients[region]
+
+    async def get_character_media_summary(self, region: str, realm: str, character: str) -> dict:
+        """Get the media assets for a character, e.g. their avatar and renders."""
+        profile = self.client(region).Retail.Profile
+        return await self._cached(
+            "character-media", region, realm, character,
+            lambda: profile.get_character_media_summary(realm, character.lower()),
+        )
+
+    async def get_character_profile_summary(self, region: str, realm: str, character: str) -> dict:
+        """Get the profile summary for a character, e.g. their race, gender and class."""
+        profile = self.client(region).Retail.Profile
+        return await self._cached(
+            "character-profile", region, realm, character,
+            lambda: profile.get_character_profile_summary(realm, character.lower()),
+        )
+
+    async def get_guild_roster(self, region: str, realm: str, guild: str) -> dict:
+        """Get every member of a guild, along with their rank, level and class. `guild` is the guild's slug."""
+        profile = self.client(region).Retail.Profile
+        return await self._cached(
+            "guild-roster", region, realm, guild,
+            lambda: profile.get_guild_roster(realm, guild.lower()),
+        )
+
+    async def _cached(self, endpoint: str, region: str, realm: str, name: str, fetch) -> dict:
+        """Look up a character or guild endpoint in the cache, fetching it if it's missing or stale."""
+        key = (region.lower(), realm.lower(), name.lower(), endpoint)
+        return await self.cache.get_or_fetch(key, self.cache_ttls[endpoint], fetch, stale_on=(UpstreamUnavailable,))
+
+    async def close(self) -> None:
+        """Close every client we've handed out."""
+        for client in self._clients.values():
+            await client.close()
+        self._clients.clear()
@@ -0,0 +1,126 @@
+import asyncio
+import time
+import typing as t
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass, asdict
+
+T = t.TypeVar("T")
+
+
+@dataclass
+class CacheStats:
+    """Counters describing how well a cache is doing."""
+
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0  # Lookups that piggybacked on a fetch that was already running
+    expirations: int = 0
+    evictions: int = 0
+    stale: int = 0  # Expired entries handed out because fetching a fresh one failed
+
+    def as_dict(self) -> dict[str, int]:
+        """Return the counters as a plain dict."""
+        return asdict(self)
+
+
+class TTLCache:
+    """
+    An async-aware LRU cache whose entries expire after a time-to-live.
+
+    Concurrent lookups for the same missing key share a single fetch, so a burst of
+    identical requests only ever hits the upstream once.
+
+    Expired entries are kept for another `max_stale` seconds, so they can be handed out
+    if fetching a fresh one fails, rather than failing the lookup outright.
+    """
+
+    def __init__(self, max_entries: int = 1024, *, max_stale: float = 0):
+        self.max_entries = max_entries
+        self.max_stale = max_stale
+        self.stats = CacheStats()
+        self._entries: OrderedDict[Hashable, tuple[float, t.Any]] = OrderedDict()
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> t.Any | None:
+        """Return the cached value for `key` if there's a fresh one, or None, without fetching anything."""
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() >= entry[0]:
+            self.stats.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry[1]
+
+    async def get_or_fetch(
+        self,
+        key: Hashable,
+        ttl: float,
+        fetch: Callable[[], Awaitable[T]],
+        *,
+        stale_on: tuple[type[Exception], ...] = (),
+    ) -> T:
+        """
+        Return the cached value for `key`, or await `fetch()` and cache its result for `ttl` seconds.
+
+        If the fetch raises one of `stale_on`, and there's an expired entry that's still
+        within `max_stale`, that's returned instead.
+        """
+        stale = None
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            now = time.monotonic()
+            if now < expires:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return value
+
+            self.stats.expirations += 1
+            if now < expires + self.max_stale:
+                stale = entry
+            else:
+                del self._entries[key]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            self.stats.misses += 1
+            task = asyncio.create_task(self._fetch(key, ttl, fetch))
+            self._in_flight[key] = task
+        else:
+            self.stats.coalesced += 1
+
+        # Shield the shared fetch, so one impatient caller can't cancel it for everyone else
+        try:
+            return await asyncio.shield(task)
+        except stale_on:
+            if stale is None:
+                raise
+            self.stats.stale += 1
+            return stale[1]
+
+    async def _fetch(self, key: Hashable, ttl: float, fetch: Callable[[], Awaitable[T]]) -> T:
+        """Run a fetch and store its result. Failures are not cached."""
+        try:
+            value = await fetch()
+            self.set(key, value, ttl)
+            return value
+        finally:
+            del self._in_flight[key]
+
+    def set(self, key: Hashable, value: t.Any, ttl: float) -> None:
+        """Store a value, evicting the least recently used entries if we're over capacity."""
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        self._entries.clear()
@@ -0,0 +1,91 @@
+"""
+Turns `!new_main` queries like "dps -mage" or "healer, death knight" into the specs they allow.
+
+Every role, class and spec name is mapped to a bitmask over `SPECS` when this module
+is imported, so evaluating a query is just a handful of bitwise operations.
+"""
+import re
+from functools import lru_cache
+
+from constants.warcraft import ALL_MASK, CLASS_MASKS, ROLE_MASKS, SPECS, Spec, specs_in
+
+
+class ClassFilterError(ValueError):
+    """Raised when a query can't be understood."""
+
+
+# Every term a query may contain, mapped to the specs it stands for
+TERMS: dict[str, int] = {"ALL": ALL_MASK, **ROLE_MASKS, **CLASS_MASKS}
+for spec in SPECS:
+    # "Frost Mage" is a single spec, but "Frost" on its own means every Frost spec
+    TERMS[spec.name.upper()] = spec.mask
+    TERMS[spec.spec_name.upper()] = TERMS.get(spec.spec_name.upper(), 0) | spec.mask
+del spec
+
+# The most words a single term is made of, e.g. "BEAST MASTERY HUNTER"
+MAX_TERM_WORDS = max(len(term.split()) for term in TERMS)
+
+REGEX_SEPARATORS = re.compile(r"[\s,]+")
+
+
+def _parse(words: list[str]) -> tuple[int, int]:
+    """
+    Greedily match the longest known term at each position.
+
+    Returns a tuple of (include mask, exclude mask).
+    """
+    include = exclude = 0
+    i = 0
+    while i < len(words):
+        excluded = words[i].startswith("-")
+        first_word = words[i].lstrip("-")
+
+        for length in range(min(MAX_TERM_WORDS, len(words) - i), 0, -1):
+            term = " ".join([first_word, *words[i + 1:i + length]])
+            if term in TERMS:
+                break
+        else:
+            raise ClassFilterError(
+                f"I don't know what '{words[i].lower()}' is. "
+                "Please provide something like 'healer', 'tank', 'ranged' or 'hunter'."
+            )
+
+        if excluded:
+            exclude |= TERMS[term]
+        else:
+            include |= TERMS[term]
+        i += length
+
+    return include, exclude
+
+
+@lru_cache(maxsize=512)
+def _select(normalized_query: str) -> tuple[Spec, ...]:
+    """Evaluate a normalized query. Results are memoized, since people tend to ask for the same things."""
+    include, exclude = _parse(normalized_query.split())
+
+    # If there are only exclusions, exclude them from the full list
+    if not include:
+        include = ALL_MASK
+
+    allowed = include & ~exclude
+    if not allowed:
+        raise ClassFilterError("Nothing matches that, there'd be nothing left to roll!")
+
+    return specs_in(allowed)
+
+
+def select_specs(query: str) -> tuple[Spec, ...]:
+    """
+    Return every spec that a query allows, in ID order.
+
+    Terms may be separated by spaces or commas, and a term prefixed with `-` is
+    excluded instead of included. If a query only excludes things, it excludes them
+    from every spec.
+
+    Raises a `ClassFilterError` if the query can't be understood, or allows nothing.
+    """
+    normalized_query = " ".join(REGEX_SEPARATORS.split(query.strip().upper()))
+    if not normalized_query:
+        raise ClassFilterError("Please provide something like 'healer', 'tank', 'ranged' or 'hunter'.")
+    return _select(normalized_query)
@@ -0,0 +1,163 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import typing as t
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from utils.cache import CacheStats
+
+T = t.TypeVar("T")
+
+
+@dataclass
+class CachedFile:
+    """A file we've previously downloaded, along with what we need to revalidate it."""
+
+    data: bytes
+    etag: str | None
+    last_modified: str | None
+    fetched_at: float
+
+    def conditional_headers(self) -> dict[str, str]:
+        """Headers that let the server answer `304 Not Modified` if the file hasn't changed."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class DiskCache:
+    """
+    A size-bounded cache of downloaded files on disk, keyed by their URL.
+
+    Each entry is a single file, named after the SHA-256 of its URL, holding one line
+    of JSON metadata followed by the raw bytes. Entries are written to a temporary
+    file and moved into place, so readers never see a half-written entry. A running
+    total of the cache's size is kept, and only once it grows past `max_bytes` is the
+    directory scanned and the least recently used entries removed.
+
+    All disk access happens in a worker thread so it never blocks the event loop.
+    """
+
+    def __init__(self, directory: Path | str, *, max_bytes: int = 512 * 1024 * 1024, fresh_for: float = 60 * 60):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.fresh_for = fresh_for
+        self.stats = CacheStats()
+        self._in_flight: dict[str, asyncio.Task] = {}
+        # Counted up from the directory the first time we write, then kept up to date as we go
+        self._total_bytes: int | None = None
+        self._total_lock = threading.Lock()
+
+    def _path(self, url: str) -> Path:
+        return self.directory / hashlib.sha256(url.encode()).hexdigest()
+
+    def is_fresh(self, entry: CachedFile) -> bool:
+        """Whether an entry is recent enough to use without asking the server about it."""
+        return time.time() - entry.fetched_at < self.fresh_for
+
+    async def single_flight(self, url: str, fetch: Callable[[], Awaitable[T]]) -> T:
+        """Await `fetch()`, or if there's already a fetch running for `url`, share its result instead."""
+        task = self._in_flight.get(url)
+        if task is None:
+            task = asyncio.create_task(fetch())
+            task.add_done_callback(lambda _: self._in_flight.pop(url, None))
+            self._in_flight[url] = task
+        else:
+            self.stats.coalesced += 1
+
+        # Shield the shared fetch, so one impatient caller can't cancel it for everyone else
+        return await asyncio.shield(task)
+
+    async def get(self, url: str) -> CachedFile | None:
+        """Return the cached entry for `url`, if we have one."""
+        return await asyncio.to_thread(self._read, self._path(url))
+
+    async def put(self, url: str, data: bytes, *, etag: str | None = None, last_modified: str | None = None) -> None:
+        """Store a freshly downloaded file, then evict old entries if we're over budget."""
+        entry = CachedFile(data, etag, last_modified, time.time())
+        await asyncio.to_thread(self._write, self._path(url), entry)
+
+    async def revalidated(self, url: str, entry: CachedFile) -> None:
+        """Mark an entry as fresh again after the server told us it hasn't changed."""
+        entry.fetched_at = time.time()
+        await asyncio.to_thread(self._write, self._path(url), entry)
+
+    def _read(self, path: Path) -> CachedFile | None:
+        try:
+            with path.open("rb") as file:
+                metadata = json.loads(file.readline())
+                data = file.read()
+        except (FileNotFoundError, ValueError):
+            return None
+
+        # Bump the modification time, which is what eviction uses to find stale entries
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(path)
+
+        return CachedFile(data, **metadata)
+
+    def _write(self, path: Path, entry: CachedFile) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        metadata = {"etag": entry.etag, "last_modified": entry.last_modified, "fetched_at": entry.fetched_at}
+
+        replaced = self._size(path)
+
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(json.dumps(metadata).encode() + b"\n")
+                file.write(entry.data)
+            os.replace(temp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(temp_path)
+            raise
+
+        with self._total_lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += self._size(path) - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        """Every entry on disk, as (last used, size, path)."""
+        entries = []
+        for path in self.directory.iterdir():
+            if path.name.startswith(".tmp-"):
+                continue
+            with contextlib.suppress(FileNotFoundError):
+                stat = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries until we're back under `max_bytes`. Called with the total's lock held."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                path.unlink()
+                self.stats.evictions += 1
+            total -= size
+        self._total_bytes = total
@@ -0,0 +1,134 @@
+"""
+Finds the cogs to load, loads them concurrently, and logs how long each one took.
+
+Which cogs get loaded can be narrowed down with environment variables:
+
+    COGS_ENABLED   Only load these cogs, e.g. "uwu,stats". Defaults to every cog.
+    COGS_DISABLED  Never load these cogs, e.g. "wow".
+"""
+import ast
+import asyncio
+import contextlib
+import importlib
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from discord.ext.commands import Bot
+
+log = logging.getLogger(__name__)
+
+# Resolved from this file rather than the working directory, so the bot can be started from anywhere.
+COGS_DIR = Path(__file__).parent.parent / "cogs"
+COGS_PACKAGE = "cogs"
+
+
+@dataclass
+class LoadTiming:
+    """How long loading a single extension took, split into importing what it depends on and setting it up."""
+
+    name: str
+    import_seconds: float = 0.0
+    setup_seconds: float = 0.0
+    error: BaseException | None = None
+
+    @property
+    def total_seconds(self) -> float:
+        return self.import_seconds + self.setup_seconds
+
+
+def discover(directory: Path = COGS_DIR) -> list[str]:
+    """List the names of every cog in `directory`, e.g. ["stats", "uwu", "wow"]."""
+    return sorted(path.stem for path in directory.glob("*.py") if not path.stem.startswith("_"))
+
+
+def parse_names(value: str) -> set[str]:
+    """Parse "uwu, wow" into {"uwu", "wow"}."""
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+def choose(available: list[str], enabled: set[str] | None = None, disabled: set[str] = frozenset()) -> list[str]:
+    """
+    Pick which of the available cogs to load.
+
+    If `enabled` is given only those are loaded, and anything in `disabled` never is.
+    """
+    unknown = ((enabled or set()) | disabled) - set(available)
+    if unknown:
+        raise ValueError(f"There's no cog called {', '.join(sorted(unknown))}. Expected one of {', '.join(available)}.")
+    return [name for name in available if (enabled is None or name in enabled) and name not in disabled]
+
+
+def top_level_imports(path: Path) -> list[str]:
+    """
+    The modules a source file imports at the top level, in order, e.g. ["asyncio", "utils.uwu"].
+
+    Imports inside functions and `if TYPE_CHECKING:` blocks are left out, since those
+    are deliberately put off until they're needed.
+    """
+    names = []
+    for node in ast.parse(path.read_text(), str(path)).body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+    return names
+
+
+def import_extension(name: str, directory: Path = COGS_DIR) -> LoadTiming:
+    """
+    Import everything an extension imports at the top level, timing how long that takes.
+
+    The extension's own module isn't run here, since discord.py runs it when it's loaded.
+    """
+    timing = LoadTiming(name)
+    started = time.perf_counter()
+    for module in top_level_imports(directory / f"{name}.py"):
+        # Anything that fails to import fails again when the extension is loaded, which reports it properly
+        with contextlib.suppress(Exception):
+            importlib.import_module(module)
+    timing.import_seconds = time.perf_counter() - started
+    return timing
+
+
+async def setup_extension(bot: Bot, timing: LoadTiming) -> None:
+    """Load an extension whose imports are already cached, timing how long its module and setup take to run."""
+    started = time.perf_counter()
+    try:
+        await bot.load_extension(f"{COGS_PACKAGE}.{timing.name}")
+    except Exception as error:
+        timing.error = error
+        log.exception("Failed to load the %s extension", timing.name)
+    timing.setup_seconds = time.perf_counter() - started
+
+
+async def load_extensions(bot: Bot, environ: dict[str, str] = os.environ) -> list[LoadTiming]:
+    """
+    Load every chosen cog, and log how long each one took.
+
+    Importing is CPU-bound, so what the cogs import is imported one after the other,
+    after which the cogs themselves are loaded, and their setups, which mostly wait on
+    I/O, run concurrently. Extensions that fail to load are logged and skipped, rather
+    than keeping the rest of the bot from starting.
+    """
+    enabled = parse_names(environ["COGS_ENABLED"]) if environ.get("COGS_ENABLED") else None
+    names = choose(discover(), enabled, parse_names(environ.get("COGS_DISABLED", "")))
+
+    started = time.perf_counter()
+    timings = [import_extension(name) for name in names]
+    await asyncio.gather(*(setup_extension(bot, timing) for timing in timings))
+    elapsed = time.perf_counter() - started
+
+    for timing in sorted(timings, key=lambda timing: timing.total_seconds, reverse=True):
+        if not timing.error:
+            log.info(
+                "Loaded %s in %.1fms (import %.1fms, setup %.1fms)",
+                timing.name,
+                timing.total_seconds * 1000,
+                timing.import_seconds * 1000,
+                timing.setup_seconds * 1000,
+            )
+    log.info("Loaded %d of %d extensions in %.1fms", sum(not timing.error for timing in timings), len(names), elapsed * 1000)
+    return timings
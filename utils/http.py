@@ -0,0 +1,144 @@
+import asyncio
+import io
+import logging
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from utils.disk_cache import CachedFile, DiskCache
+from utils.metrics import UPSTREAM_LATENCY
+
+log = logging.getLogger(__name__)
+
+
+class DownloadError(Exception):
+    """Raised when a download fails, times out, or grows past its size cap."""
+
+
+@dataclass
+class Download:
+    """The result of a (possibly conditional) download."""
+
+    status: int
+    data: bytes
+    etag: str | None = None
+    last_modified: str | None = None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+def create_session(*, limit: int = 20, limit_per_host: int = 4, timeout: float = 15) -> aiohttp.ClientSession:
+    """
+    Create a keep-alive session for downloading assets.
+
+    `limit` caps the total number of open connections, `limit_per_host` caps how many
+    of those may point at a single host, and `timeout` is the total number of seconds
+    a single request may take, including reading the body.
+    """
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout))
+
+
+async def fetch(
+    session: aiohttp.ClientSession,
+    url: str,
+    *,
+    max_bytes: int,
+    chunk_size: int = 64 * 1024,
+    headers: dict[str, str] | None = None,
+) -> Download:
+    """Stream `url` into memory in chunks, giving up as soon as it grows past `max_bytes`."""
+    buffer = io.BytesIO()
+
+    try:
+        with UPSTREAM_LATENCY.labels("cdn", urlsplit(url).hostname).time():
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    return Download(response.status, b"")
+
+                response.raise_for_status()
+
+                # Don't bother reading anything if the server already told us it's too big
+                if response.content_length is not None and response.content_length > max_bytes:
+                    raise DownloadError(f"That file is too big ({response.content_length} bytes).")
+
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    if buffer.tell() + len(chunk) > max_bytes:
+                        raise DownloadError(f"That file is bigger than {max_bytes} bytes.")
+                    buffer.write(chunk)
+
+    except asyncio.TimeoutError:
+        raise DownloadError("Timed out while downloading that file.") from None
+    except aiohttp.ClientError as error:
+        raise DownloadError(f"Couldn't download that file ({error}).") from error
+
+    return Download(
+        response.status,
+        buffer.getvalue(),
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+    )
+
+
+async def download_cached(
+    session: aiohttp.ClientSession,
+    cache: DiskCache,
+    url: str,
+    *,
+    max_bytes: int,
+    chunk_size: int = 64 * 1024,
+) -> io.BytesIO:
+    """
+    Download `url` through a disk cache, and return it as an IO stream.
+
+    Fresh entries are served straight from disk. Stale ones are revalidated with a
+    conditional GET, so an unchanged file costs a `304` instead of a full download.
+    Concurrent downloads of the same URL share a single request, and if refreshing a
+    stale entry fails, the stale copy is served instead.
+    """
+    cached = await cache.get(url)
+    if cached is not None and cache.is_fresh(cached):
+        cache.stats.hits += 1
+        return io.BytesIO(cached.data)
+
+    try:
+        data = await cache.single_flight(
+            url, lambda: _refresh(session, cache, url, cached, max_bytes=max_bytes, chunk_size=chunk_size)
+        )
+    except DownloadError as error:
+        if cached is None:
+            raise
+        log.warning("Couldn't refresh %s, serving the cached copy instead: %s", url, error)
+        cache.stats.stale += 1
+        return io.BytesIO(cached.data)
+    return io.BytesIO(data)
+
+
+async def _refresh(
+    session: aiohttp.ClientSession,
+    cache: DiskCache,
+    url: str,
+    cached: CachedFile | None,
+    *,
+    max_bytes: int,
+    chunk_size: int,
+) -> bytes:
+    """Download `url`, or revalidate the stale `cached` copy of it, and store the result."""
+    headers = None
+    if cached is not None:
+        cache.stats.expirations += 1
+        headers = cached.conditional_headers()
+
+    result = await fetch(session, url, max_bytes=max_bytes, chunk_size=chunk_size, headers=headers)
+
+    if result.not_modified and cached is not None:
+        cache.stats.hits += 1
+        await cache.revalidated(url, cached)
+        return cached.data
+
+    cache.stats.misses += 1
+    await cache.put(url, result.data, etag=result.etag, last_modified=result.last_modified)
+    return result.data
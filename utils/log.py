@@ -0,0 +1,120 @@
+"""
+Logging that never blocks the event loop.
+
+Log records are put on a queue by a `QueueHandler`, and written to stdout by a
+`QueueListener` in a background thread. Everything is configured from environment
+variables:
+
+    LOG_LEVEL     The root level, e.g. INFO. Defaults to INFO.
+    LOG_LEVELS    Levels for specific loggers, e.g. "discord.gateway=WARNING,cogs=DEBUG".
+    LOG_SAMPLE    Keep only a fraction of the DEBUG and INFO records from noisy loggers,
+                  e.g. "discord.gateway=0.1". Warnings and errors are always kept.
+    LOG_FORMAT    "text" or "json", for one JSON object per line. Defaults to text.
+"""
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats each record as a single line of JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    A `QueueHandler` that leaves the formatting to the listener.
+
+    The stock handler formats the whole record before queueing it, tracebacks and
+    all, which would leave nothing for a structured formatter to work with.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge in the arguments and render any traceback now, while they're still
+        # valid, but leave it to the listener's formatter to put them together.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through only a fraction of the DEBUG and INFO records from certain loggers."""
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        # Longest names first, so "discord.gateway" wins over "discord"
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(f"{name}."):
+                return random.random() < rate
+        return True
+
+
+def parse_pairs(value: str) -> dict[str, str]:
+    """Parse "a=1,b=2" into {"a": "1", "b": "2"}."""
+    pairs = {}
+    for pair in value.split(","):
+        if not pair.strip():
+            continue
+        name, _, setting = pair.partition("=")
+        if not setting:
+            raise ValueError(f"Expected something like 'logger=value', got '{pair.strip()}'.")
+        pairs[name.strip()] = setting.strip()
+    return pairs
+
+
+def setup_logging(environ: dict[str, str] = os.environ) -> QueueListener:
+    """
+    Route every log record through a queue to a background thread, configured from `environ`.
+
+    Returns the listener, which should be stopped on shutdown to flush anything still queued.
+    """
+    formatter = JSONFormatter() if environ.get("LOG_FORMAT", "text").lower() == "json" else logging.Formatter(TEXT_FORMAT)
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    sample_rates = {name: float(rate) for name, rate in parse_pairs(environ.get("LOG_SAMPLE", "")).items()}
+    if sample_rates:
+        handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    root.setLevel(environ.get("LOG_LEVEL", "INFO").upper())
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+
+    for name, level in parse_pairs(environ.get("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    listener = QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    return listener
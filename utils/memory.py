@@ -0,0 +1,89 @@
+"""
+How much of Discord the bot keeps in memory, and a report of how much it's keeping.
+
+Configured from environment variables:
+
+    MESSAGE_CACHE_SIZE  How many messages to keep. The cogs only use cached messages to
+                        save a request when someone links or replies to one, so 0 turns
+                        the cache off, and those messages are fetched when they're needed
+                        instead. Defaults to 1000.
+    MEMBER_CACHE        Which members to keep: "none", "all", or some of "joined,voice".
+                        The cogs only ever look at the author of a command, who comes
+                        along with the message, so this defaults to none. Servers are
+                        only chunked at startup if joined members are kept.
+"""
+import os
+import typing as t
+from collections import Counter
+
+from discord import MemberCacheFlags
+from discord.ext.commands import Bot
+
+DEFAULT_MESSAGE_CACHE_SIZE = 1000
+
+# How many of the channels with the most cached messages to show in the report
+REPORT_TOP_CHANNELS = 5
+
+
+def parse_member_cache(value: str) -> MemberCacheFlags:
+    """Parse "none", "all" or a list of flags like "joined,voice" into member cache flags."""
+    value = value.strip().lower()
+    if value == "none":
+        return MemberCacheFlags.none()
+    if value == "all":
+        return MemberCacheFlags.all()
+
+    flags = MemberCacheFlags.none()
+    for name in filter(None, (name.strip() for name in value.split(","))):
+        if name not in MemberCacheFlags.VALID_FLAGS:
+            raise ValueError(f"Unknown member cache flag '{name}', expected none, all, or some of {', '.join(MemberCacheFlags.VALID_FLAGS)}.")
+        setattr(flags, name, True)
+    return flags
+
+
+def cache_options(environ: dict[str, str] = os.environ) -> dict[str, t.Any]:
+    """The options to create the bot with, so it only caches what we've been asked to."""
+    message_cache_size = int(environ.get("MESSAGE_CACHE_SIZE", DEFAULT_MESSAGE_CACHE_SIZE))
+    member_cache_flags = parse_member_cache(environ.get("MEMBER_CACHE", "none"))
+    return {
+        # discord.py treats 0 as "use the default", it's None that turns the cache off
+        "max_messages": message_cache_size if message_cache_size > 0 else None,
+        "member_cache_flags": member_cache_flags,
+        # Chunking fetches every member of every server, which is a waste if we won't keep them
+        "chunk_guilds_at_startup": member_cache_flags.joined,
+    }
+
+
+def resident_memory() -> int | None:
+    """How many bytes of memory the process is using right now, or None if we can't tell on this platform."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def memory_report(bot: Bot) -> list[str]:
+    """Describe how much the bot has cached, one line per cache."""
+    connection = bot._connection
+    rss = resident_memory()
+    lines = [f"process: {rss / 1024 / 1024:.1f} MiB resident" if rss is not None else "process: unknown"]
+
+    messages = bot.cached_messages
+    if connection.max_messages is None:
+        lines.append("messages: not cached, fetched when needed")
+    else:
+        lines.append(f"messages: {len(messages)}/{connection.max_messages}")
+        busiest = Counter(message.channel.id for message in messages).most_common(REPORT_TOP_CHANNELS)
+        for channel_id, count in busiest:
+            channel = bot.get_channel(channel_id)
+            lines.append(f"  #{getattr(channel, 'name', channel_id)}: {count}")
+
+    flags = connection.member_cache_flags
+    enabled = [name for name in MemberCacheFlags.VALID_FLAGS if getattr(flags, name)]
+    members = sum(len(guild.members) for guild in bot.guilds)
+    lines.append(f"members: {members} across {len(bot.guilds)} servers (caching {', '.join(enabled) or 'none'})")
+    lines.append(f"users: {len(bot.users)}")
+    lines.append(f"channels: {sum(len(guild.channels) for guild in bot.guilds)}")
+    lines.append(f"emoji: {len(bot.emojis)}")
+    return lines
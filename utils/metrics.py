@@ -0,0 +1,179 @@
+"""
+In-process latency histograms, which the stats cog shows with `!stats` and can serve in Prometheus' text format.
+
+Metrics are registered once, at import time, on the module level `REGISTRY`, and
+are then observed from anywhere, e.g.
+
+    with UPSTREAM_LATENCY.labels("battlenet", "/oauth/token").time():
+        ...
+"""
+import bisect
+import contextlib
+import re
+import time
+import typing as t
+from collections.abc import Iterator
+
+# Upper bounds of the histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    """Counts observations into buckets, like a Prometheus histogram, so we can estimate percentiles cheaply."""
+
+    def __init__(self, buckets: t.Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # The last one counts everything past the biggest bucket
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a single observation."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    @contextlib.contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe how many seconds the body of a `with` block takes, even if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate the value below which a fraction `q` of the observations fall.
+
+        Like Prometheus' `histogram_quantile`, this assumes observations are spread
+        evenly within each bucket. Anything past the biggest bucket is reported as
+        the biggest bucket.
+        """
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for upper, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return self.buckets[-1]
+
+
+class HistogramFamily:
+    """A named histogram, with one child histogram for every combination of label values."""
+
+    def __init__(self, name: str, help_text: str, labels: t.Sequence[str] = (), buckets: t.Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.children: dict[tuple[str, ...], Histogram] = {}
+
+    def labels(self, *values: t.Any) -> Histogram:
+        """Get the histogram for a combination of label values, creating it the first time it's asked for."""
+        if len(values) != len(self.label_names):
+            raise ValueError(f"{self.name} takes {len(self.label_names)} label values, got {len(values)}.")
+
+        key = tuple(str(value) for value in values)
+        histogram = self.children.get(key)
+        if histogram is None:
+            histogram = self.children[key] = Histogram(self.buckets)
+        return histogram
+
+    def observe(self, value: float) -> None:
+        """Record an observation on the unlabelled histogram."""
+        self.labels().observe(value)
+
+    def time(self) -> t.ContextManager[None]:
+        """Time a `with` block on the unlabelled histogram."""
+        return self.labels().time()
+
+    def render(self) -> list[str]:
+        """Render every child histogram in Prometheus' text exposition format."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for values, histogram in sorted(self.children.items()):
+            labels = dict(zip(self.label_names, values))
+            cumulative = 0
+            for upper, count in zip((*histogram.buckets, float("inf")), histogram.counts):
+                cumulative += count
+                le = "+Inf" if upper == float("inf") else repr(float(upper))
+                lines.append(f"{self.name}_bucket{format_labels({**labels, 'le': le})} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {histogram.sum!r}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {histogram.count}")
+        return lines
+
+
+class Registry:
+    """Every metric the bot knows about."""
+
+    def __init__(self):
+        self.families: dict[str, HistogramFamily] = {}
+
+    def histogram(self, name: str, help_text: str, labels: t.Sequence[str] = (), **options) -> HistogramFamily:
+        """Register a histogram, or return the existing one if it's already registered."""
+        if name not in self.families:
+            self.families[name] = HistogramFamily(name, help_text, labels, **options)
+        return self.families[name]
+
+    def render(self) -> str:
+        """Render every metric in Prometheus' text exposition format."""
+        return "".join(f"{line}\n" for family in self.families.values() for line in family.render())
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    """Format labels the way Prometheus expects them, e.g. `{command="uwu",outcome="ok"}`."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in labels.items()) + "}"
+
+
+def escape_label_value(value: str) -> str:
+    """Escape backslashes, double quotes and newlines, the only characters a label value can't contain as-is."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGEX_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+REGEX_CHARACTER_PATH = re.compile(r"^(/profile/wow/character)/[^/]+/[^/]+")
+REGEX_GUILD_PATH = re.compile(r"^(/data/wow/guild)/[^/]+/[^/]+")
+
+
+def endpoint_label(path: str) -> str:
+    """
+    Turn a request path into a label that doesn't grow with every character or guild we look up.
+
+    e.g. `/profile/wow/character/argent-dawn/lemon/character-media` becomes
+    `/profile/wow/character/{realm}/{character}/character-media`, and
+    `/data/wow/guild/argent-dawn/oomfies/roster` becomes `/data/wow/guild/{realm}/{guild}/roster`.
+    """
+    path = REGEX_CHARACTER_PATH.sub(r"\1/{realm}/{character}", path)
+    path = REGEX_GUILD_PATH.sub(r"\1/{realm}/{guild}", path)
+    return REGEX_NUMERIC_SEGMENT.sub("/{id}", path)
+
+
+REGISTRY = Registry()
+
+COMMAND_LATENCY = REGISTRY.histogram(
+    "oomfie_command_seconds",
+    "How long each command took to run, from on_command to on_command_completion or on_command_error.",
+    ("command", "outcome"),
+)
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    "oomfie_upstream_request_seconds",
+    "How long each request to Battle.net or the CDN took.",
+    ("service", "endpoint"),
+)
+DISCORD_LATENCY = REGISTRY.histogram(
+    "oomfie_discord_request_seconds",
+    "How long sending and editing Discord messages took.",
+    ("action",),
+)
+LOOP_LAG = REGISTRY.histogram(
+    "oomfie_event_loop_lag_seconds",
+    "How much later than asked for the event loop woke up a sleeping task.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
@@ -0,0 +1,109 @@
+"""
+Draws characters side by side like raid frames, for `!party`.
+
+Everything here takes and returns plain bytes, so it can run in a worker process,
+where decoding, resizing and pasting images can't hold up the event loop.
+"""
+import io
+import math
+from dataclasses import dataclass
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+from utils.transcode import DECODE_ERRORS
+
+# The size of the picture on each tile, by the kind of asset it's drawn from
+PICTURE_SIZES = {"inset": (230, 116), "avatar": (84, 84)}
+LABEL_HEIGHT = 18
+ICON_SIZE = 22
+GAP = 4
+COLUMNS = 5  # Like a raid group
+
+BACKGROUND = (24, 24, 28)
+LABEL_BACKGROUND = (12, 12, 14)
+MISSING_PICTURE = (60, 60, 66)
+
+
+@dataclass
+class TileSource:
+    """Everything needed to draw one character's tile."""
+
+    label: str  # Usually the character's name
+    color: str  # Their class color, e.g. "#C69B6D"
+    kind: str = "inset"  # Which asset `picture` is, a key of PICTURE_SIZES
+    picture: bytes | None = None  # The asset, or None if we couldn't get it
+    icon: bytes | None = None  # Their spec icon
+
+
+def _encode(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    # Tiles are re-read moments later, so favour speed over size
+    image.save(buffer, "PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def _decode(data: bytes | None, mode: str) -> Image.Image | None:
+    """Decode an image and convert it to `mode`, or return None if there isn't one or it can't be read."""
+    if data is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.convert(mode)
+    except DECODE_ERRORS:
+        return None
+
+
+def render_tile(source: TileSource) -> bytes:
+    """Draw a single character: their picture, with their spec icon in the corner and their name underneath."""
+    width, height = PICTURE_SIZES[source.kind]
+    tile = Image.new("RGB", (width, height + LABEL_HEIGHT), LABEL_BACKGROUND)
+
+    # A download that isn't an image, e.g. a truncated file or an error page, is drawn as if it were missing
+    picture = _decode(source.picture, "RGB")
+    if picture is not None:
+        tile.paste(ImageOps.fit(picture, (width, height), Image.LANCZOS))
+    else:
+        tile.paste(MISSING_PICTURE, (0, 0, width, height))
+
+    icon = _decode(source.icon, "RGBA")
+    if icon is not None:
+        icon = icon.resize((ICON_SIZE, ICON_SIZE), Image.LANCZOS)
+        tile.paste(icon, (3, 3), icon)
+
+    draw = ImageDraw.Draw(tile)
+    draw.text((4, height + 3), source.label, fill=source.color, font=ImageFont.load_default())
+    return _encode(tile)
+
+
+def render_grid(tiles: list[bytes], columns: int = COLUMNS) -> bytes:
+    """Lay rendered tiles out in rows of `columns`, in order."""
+    images = [Image.open(io.BytesIO(tile)) for tile in tiles]
+    tile_width = max(image.width for image in images)
+    tile_height = max(image.height for image in images)
+    columns = min(columns, len(images))
+    rows = math.ceil(len(images) / columns)
+
+    grid = Image.new(
+        "RGB",
+        (columns * (tile_width + GAP) + GAP, rows * (tile_height + GAP) + GAP),
+        BACKGROUND,
+    )
+    for i, image in enumerate(images):
+        row, column = divmod(i, columns)
+        grid.paste(image, (GAP + column * (tile_width + GAP), GAP + row * (tile_height + GAP)))
+        image.close()
+
+    buffer = io.BytesIO()
+    grid.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def render_party(tiles: list[bytes | TileSource], columns: int = COLUMNS) -> tuple[list[bytes], bytes]:
+    """
+    Draw any tiles that haven't been drawn yet, and lay them all out in a grid.
+
+    `tiles` may mix tiles that were already rendered with sources for new ones. Returns
+    every tile, rendered, so the new ones can be cached, along with the grid as a PNG.
+    """
+    rendered = [render_tile(tile) if isinstance(tile, TileSource) else tile for tile in tiles]
+    return rendered, render_grid(rendered, columns)
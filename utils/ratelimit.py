@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    A token bucket rate limiter.
+
+    Allows bursts of up to `capacity` actions, and refills at `rate` tokens per second.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def is_full(self) -> bool:
+        """Whether the bucket has refilled completely, making it no different from a brand new one."""
+        self._refill()
+        return self._tokens >= self.capacity
+
+    def delay(self, tokens: float = 1) -> float:
+        """How many seconds until `tokens` tokens will be available."""
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take `tokens` tokens if they're available right now, without waiting."""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """Wait until `tokens` tokens are available, then take them."""
+        while not self.try_acquire(tokens):
+            await asyncio.sleep(self.delay(tokens))
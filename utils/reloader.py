@@ -0,0 +1,189 @@
+"""
+Reloads cogs, and the tables they're built from, without restarting the bot or reconnecting to Discord.
+
+The loaded extensions and everything in `constants` are watched, along with every
+`utils` module they import, directly or not, found by reading their imports. The
+`utils` modules in `STATEFUL_UTILS` are left out, since they define the long-lived
+objects kept in the resources registry, like the caches, clients and worker pools,
+or hold state of their own, like the metrics registry, or the shared random generator
+and the fork hook that reseeds it. Reloading those would leave the cogs catching
+exceptions and checking types the existing objects don't use, or register the same
+hooks again, so they need a restart to change.
+
+When a module changes, every watched module that imports it, directly or not, is
+reloaded too, in dependency order. Each module is executed into a new module object,
+and they're only swapped into `sys.modules` once every one of them has run without
+errors, so a typo in a table can never leave half the bot on the old tables and half
+on the new. The affected extensions are then reloaded one by one. Commands already
+running carry on with the code and tables they started with.
+"""
+import ast
+import asyncio
+import functools
+import importlib.util
+import logging
+import sys
+from graphlib import TopologicalSorter
+from pathlib import Path
+
+from discord.ext.commands import Bot
+
+log = logging.getLogger(__name__)
+
+ROOT = Path(__file__).parent.parent
+CONSTANTS_DIR = ROOT / "constants"
+STATEFUL_UTILS = frozenset({
+    "utils.battlenet",
+    "utils.cache",
+    "utils.disk_cache",
+    "utils.http",
+    "utils.log",
+    "utils.metrics",
+    "utils.ratelimit",
+    "utils.reloader",
+    "utils.resources",
+    "utils.rng",
+    "utils.scheduler",
+    "utils.workers",
+})
+
+
+class ReloadError(Exception):
+    """Raised when something couldn't be reloaded."""
+
+
+def imported_modules(path: Path) -> frozenset[str]:
+    """Every module a source file imports, anywhere in the file, e.g. {"constants.warcraft", "re"}."""
+    return _imported_modules(path, path.stat().st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=256)
+def _imported_modules(path: Path, mtime: int) -> frozenset[str]:
+    """Parse a file for its imports, only once for each time it's changed."""
+    names = set()
+    for node in ast.walk(ast.parse(path.read_text(), str(path))):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            # `from package import module` imports a module too
+            names.add(node.module)
+            names.update(f"{node.module}.{alias.name}" for alias in node.names)
+    return frozenset(names)
+
+
+def swap_modules(modules: dict[str, Path]) -> None:
+    """
+    Execute each module afresh, in order, and swap them all in together.
+
+    If any of them fails, every module is put back the way it was before this was called.
+    """
+    previous = {name: sys.modules.get(name) for name in modules}
+    try:
+        for name, path in modules.items():
+            spec = importlib.util.spec_from_file_location(name, path)
+            module = importlib.util.module_from_spec(spec)
+            # Later modules have to import this version, not the one it's replacing
+            sys.modules[name] = module
+            spec.loader.exec_module(module)
+    except BaseException:
+        for name, module in previous.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+        raise
+
+    # `import constants.warcraft` looks the module up on its package
+    for name in modules:
+        package, _, attribute = name.rpartition(".")
+        if package in sys.modules:
+            setattr(sys.modules[package], attribute, sys.modules[name])
+
+
+class Reloader:
+    """Keeps track of which watched modules have changed on disk, and reloads them along with everything built on them."""
+
+    def __init__(self, bot: Bot, *, exclude: set[str] = frozenset()):
+        self.bot = bot
+        self.exclude = exclude
+        self._mtimes: dict[str, int] = {}
+        self._lock = asyncio.Lock()
+        self.changed()
+
+    def watched(self) -> dict[str, Path]:
+        """Every module that may be reloaded, and its source file."""
+        modules = {f"constants.{path.stem}": path for path in sorted(CONSTANTS_DIR.glob("*.py"))}
+        modules.update({name: Path(module.__file__) for name, module in self.bot.extensions.items()})
+
+        # Follow imports out into `utils`, however many modules deep
+        pending = list(modules.values())
+        while pending:
+            for name in imported_modules(pending.pop()):
+                path = ROOT / f"{name.replace('.', '/')}.py"
+                if name.startswith("utils.") and name not in modules and name not in STATEFUL_UTILS and path.is_file():
+                    modules[name] = path
+                    pending.append(path)
+
+        return {name: path for name, path in modules.items() if name not in self.exclude}
+
+    def changed(self) -> set[str]:
+        """Which watched modules have changed on disk since they were last loaded."""
+        changed = set()
+        for name, path in self.watched().items():
+            mtime = path.stat().st_mtime_ns
+            if self._mtimes.setdefault(name, mtime) != mtime:
+                changed.add(name)
+        return changed
+
+    def plan(self, names: set[str]) -> list[str]:
+        """Every module that has to be reloaded along with `names`, in the order they have to be reloaded in."""
+        watched = self.watched()
+        if unknown := names - watched.keys():
+            raise ReloadError(f"I don't know how to reload {', '.join(sorted(unknown))}.")
+
+        dependencies = {name: imported_modules(path) & watched.keys() for name, path in watched.items()}
+        pending = set(names)
+        while dependents := {name for name, imports in dependencies.items() if imports & pending} - pending:
+            pending |= dependents
+
+        return list(TopologicalSorter({name: dependencies[name] & pending for name in pending}).static_order())
+
+    async def reload(self, names: set[str]) -> list[str]:
+        """
+        Reload `names`, and everything that imports them, returning everything that was reloaded.
+
+        Raises a `ReloadError` if anything couldn't be reloaded. If that happened while
+        reloading the modules, nothing was changed. If it happened while reloading an
+        extension, that extension keeps running as it was, but the rest are reloaded.
+        """
+        async with self._lock:
+            watched = self.watched()
+            order = self.plan(names)
+            # Whatever happens, don't try these same files again until they change again
+            self._mtimes.update({name: watched[name].stat().st_mtime_ns for name in order})
+
+            modules = {name: watched[name] for name in order if name not in self.bot.extensions}
+            try:
+                swap_modules(modules)
+            except Exception as error:
+                log.exception("Failed to reload %s", ", ".join(modules))
+                raise ReloadError(f"Nothing was reloaded, since {error.__class__.__name__}: {error}") from error
+
+            failed = []
+            for name in order:
+                if name not in self.bot.extensions:
+                    continue
+                try:
+                    await self.bot.reload_extension(name)
+                except Exception:
+                    log.exception("Failed to reload the %s extension", name)
+                    failed.append(name)
+
+            reloaded = [name for name in order if name not in failed]
+            log.info("Reloaded %s", ", ".join(reloaded))
+            if failed:
+                raise ReloadError(
+                    f"Reloaded {', '.join(reloaded) or 'nothing'}, but {', '.join(failed)} failed, "
+                    "and will keep running as they were. See the logs for why."
+                )
+            return reloaded
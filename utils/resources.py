@@ -0,0 +1,57 @@
+"""
+Long-lived things, like HTTP sessions, caches and worker pools, that outlive the cogs using them.
+
+Cogs are unloaded and loaded again whenever they're reloaded, so anything that's
+expensive to build or slow to warm up is kept on the bot instead, and handed to the
+new cog as it's loaded. Commands still running on the old cog keep using the same
+objects, so nothing is pulled out from under them. Everything is closed once, when
+the bot shuts down.
+"""
+import inspect
+import logging
+import typing as t
+from collections.abc import Callable
+
+from discord.ext.commands import Bot
+
+log = logging.getLogger(__name__)
+
+T = t.TypeVar("T")
+
+
+class Resources:
+    """Named resources, each created the first time it's asked for."""
+
+    def __init__(self):
+        self._resources: dict[str, t.Any] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._resources
+
+    def get(self, name: str, factory: Callable[[], T]) -> T:
+        """Get a resource, calling `factory` to create it if it doesn't exist yet."""
+        if name not in self._resources:
+            self._resources[name] = factory()
+        return self._resources[name]
+
+    async def close(self) -> None:
+        """Close every resource that can be closed, newest first, and forget about them all."""
+        while self._resources:
+            name, resource = self._resources.popitem()
+            close = getattr(resource, "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                log.exception("Failed to close %s", name)
+
+
+def get_resources(bot: Bot) -> Resources:
+    """Return the resources shared by the whole bot, creating them the first time they're asked for."""
+    resources = getattr(bot, "resources", None)
+    if resources is None:
+        resources = bot.resources = Resources()
+    return resources
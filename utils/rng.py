@@ -0,0 +1,24 @@
+import os
+import random
+
+# Unseeded streams share this generator, since seeding a fresh one from the OS costs
+# more than uwuifying a short message. Forked worker processes reseed their copy.
+_SHARED = random.Random()
+os.register_at_fork(after_in_child=_SHARED.seed)
+
+
+class RandomStream:
+    """
+    The random decisions for a single request.
+
+    Pass a `seed` to get exactly the same decisions every time, e.g. for golden tests
+    and benchmarks. The methods are bound straight to the underlying generator, so
+    a draw costs no more than calling the `random` module does.
+    """
+
+    def __init__(self, seed: int | None = None):
+        self.seed = seed
+        generator = _SHARED if seed is None else random.Random(seed)
+        self.random = generator.random
+        self.choice = generator.choice
+        self.randint = generator.randint
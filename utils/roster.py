@@ -0,0 +1,123 @@
+"""
+Pages of a guild roster for `!roster`, filled in as each member's lookups come back.
+
+The roster itself arrives in one request, so every member gets a line right away,
+and their race, spec and item level are added once their profile has been fetched.
+"""
+import re
+from dataclasses import dataclass
+
+import discord
+from discord import Embed
+
+# Small enough that a page with long avatar links still fits in an embed description
+MEMBERS_PER_PAGE = 15
+
+# How long the page buttons keep working after the last time someone used them
+PAGE_BUTTON_TIMEOUT = 10 * 60
+
+REGEX_NOT_SLUG = re.compile(r"[^a-z0-9-]+")
+
+
+def slugify(name: str) -> str:
+    """Turn a guild or realm name into the slug Battle.net expects, e.g. "Oomfie's Banshees" becomes "oomfies-banshees"."""
+    return REGEX_NOT_SLUG.sub("", "-".join(name.lower().replace("'", "").split()))
+
+
+@dataclass
+class RosterEntry:
+    """A single guild member, and whatever we've found out about them so far."""
+
+    name: str
+    realm: str
+    level: int
+    rank: int
+    description: str | None = None  # e.g. "Male Dark Iron Dwarf Blood Death Knight, 489 ilvl"
+    avatar: str | None = None
+    error: str | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.description is not None or self.error is not None
+
+    def line(self) -> str:
+        """This member's line on the roster."""
+        name = f"[{self.name}]({self.avatar})" if self.avatar else self.name
+        if self.error:
+            return f"`{self.rank}` **{name}** {self.level} · *{self.error}*"
+        if self.description is None:
+            return f"`{self.rank}` **{name}** {self.level} · …"
+        return f"`{self.rank}` **{name}** {self.level} {self.description}"
+
+
+def describe_profile(profile: dict) -> str:
+    """Describe a character from their profile summary, e.g. "Male Dark Iron Dwarf Blood Death Knight, 489 ilvl"."""
+    parts = [profile["gender"]["name"], profile["race"]["name"]]
+    if spec := profile.get("active_spec"):
+        parts.append(spec["name"])
+    parts.append(profile["character_class"]["name"])
+
+    description = " ".join(parts)
+    if item_level := profile.get("equipped_item_level"):
+        description += f", {item_level} ilvl"
+    return description
+
+
+def roster_entries(roster: dict) -> list[RosterEntry]:
+    """Turn a guild roster into entries, ordered by rank and then by name."""
+    entries = [
+        RosterEntry(
+            name=member["character"]["name"],
+            realm=member["character"]["realm"]["slug"],
+            level=member["character"]["level"],
+            rank=member["rank"],
+        )
+        for member in roster.get("members", ())
+    ]
+    entries.sort(key=lambda entry: (entry.rank, entry.name))
+    return entries
+
+
+class RosterPages(discord.ui.View):
+    """The roster, a page at a time, with buttons to flip between pages."""
+
+    def __init__(self, title: str, entries: list[RosterEntry]):
+        super().__init__(timeout=PAGE_BUTTON_TIMEOUT)
+        self.title = title
+        self.entries = entries
+        self.page = 0
+        self._update_buttons()
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-len(self.entries) // MEMBERS_PER_PAGE))
+
+    def embed(self) -> Embed:
+        """Render the current page."""
+        start = self.page * MEMBERS_PER_PAGE
+        lines = [entry.line() for entry in self.entries[start:start + MEMBERS_PER_PAGE]]
+        done = sum(entry.done for entry in self.entries)
+
+        embed = Embed(title=self.title, description="\n".join(lines) or "Nobody's here.")
+        footer = f"Page {self.page + 1}/{self.page_count} · {len(self.entries)} members"
+        if done < len(self.entries):
+            footer += f" · looked up {done} so far"
+        embed.set_footer(text=footer)
+        return embed
+
+    def _update_buttons(self) -> None:
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+
+    async def _show(self, interaction: discord.Interaction, page: int) -> None:
+        self.page = min(max(page, 0), self.page_count - 1)
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        await self._show(interaction, self.page + 1)
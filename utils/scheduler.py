@@ -0,0 +1,249 @@
+"""
+A scheduler that every Battle.net request goes through, so we stay inside Blizzard's quotas and back off when it's struggling.
+
+Requests wait for a token from every quota's bucket, and while they wait, interactive
+ones go ahead of bulk and background ones. The priority comes from the context the
+request is made in, so a whole batch of lookups can be marked at once, e.g.
+
+    with request_priority(Priority.BULK):
+        await asyncio.gather(*lookups)
+
+Requests that fail in a way that might not happen again, like a timeout, a 5xx or a
+429, are retried with jittered exponential backoff, honouring `Retry-After`. Once
+enough of those pile up in a row the circuit breaker opens, and requests fail right
+away with an `UpstreamUnavailable` instead of queueing up behind a dead upstream.
+"""
+import asyncio
+import contextlib
+import enum
+import heapq
+import itertools
+import logging
+import random
+import time
+import typing as t
+from collections.abc import Awaitable, Callable, Iterator
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+
+import aiohttp
+
+from utils.ratelimit import TokenBucket
+
+log = logging.getLogger(__name__)
+
+T = t.TypeVar("T")
+
+# Blizzard allows 100 requests per second and 36,000 per hour, as (requests, per seconds)
+BATTLENET_QUOTAS = ((100, 1), (36_000, 60 * 60))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class Priority(enum.IntEnum):
+    """Which requests go first when we're up against the quota. Lower goes first."""
+
+    INTERACTIVE = 0  # Someone's waiting on a command
+    BULK = 1  # Someone's waiting, but on a lot of requests, e.g. a whole guild roster
+    BACKGROUND = 2  # Nobody's waiting, e.g. refreshing the access token ahead of time
+
+
+_priority: ContextVar[Priority] = ContextVar("request_priority", default=Priority.INTERACTIVE)
+
+
+@contextlib.contextmanager
+def request_priority(priority: Priority) -> Iterator[None]:
+    """Make every request in the `with` block, and in tasks created inside it, with this priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when the upstream is failing, either right now or often enough that we've stopped trying for a while."""
+
+
+@dataclass
+class SchedulerStats:
+    """Counters describing how the upstream is treating us."""
+
+    requests: int = 0
+    queued: int = 0  # Requests that had to wait for the quota
+    retries: int = 0
+    throttled: int = 0  # 429s
+    failures: int = 0  # Timeouts, dropped connections and 5xx
+    rejected: int = 0  # Turned away by the open circuit breaker
+
+    def as_dict(self) -> dict[str, int]:
+        """Return the counters as a plain dict."""
+        return asdict(self)
+
+
+class CircuitBreaker:
+    """
+    Stops us hammering an upstream that's down.
+
+    After `failure_threshold` failures in a row the breaker opens, and everything is
+    turned away. Once every `reset_after` seconds a single request is let through to
+    see whether things have recovered, and the first success closes it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: float | None = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        """Whether a request may go ahead right now."""
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            # Let this one through to test the water, and nobody else for another while
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            log.info("The upstream has recovered, closing the circuit breaker")
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                log.warning("%d upstream failures in a row, opening the circuit breaker", self.failures)
+            self.opened_at = time.monotonic()
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a request that failed like this might succeed if we tried it again."""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRY_STATUSES
+    return isinstance(error, (asyncio.TimeoutError, aiohttp.ClientConnectionError))
+
+
+def retry_after(error: BaseException) -> float | None:
+    """How long the upstream asked us to wait with a `Retry-After` header, if it did."""
+    headers = getattr(error, "headers", None) or {}
+    with contextlib.suppress(ValueError, TypeError):
+        return float(headers.get("Retry-After"))
+    return None
+
+
+class RequestScheduler:
+    """
+    Runs requests within a set of quotas, in priority order, retrying and circuit breaking as needed.
+
+    `quotas` are pairs of (requests, per seconds), each getting its own token bucket,
+    and a request has to get a token from all of them.
+    """
+
+    def __init__(
+        self,
+        quotas: t.Sequence[tuple[int, float]] = BATTLENET_QUOTAS,
+        *,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 8,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.buckets = [TokenBucket(requests / seconds, requests) for requests, seconds in quotas]
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = SchedulerStats()
+
+        self._waiting: list[tuple[Priority, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+        self._paused_until = 0.0
+
+    async def run(self, request: Callable[[], Awaitable[T]]) -> T:
+        """Make a request once the quotas allow it, retrying it if it fails in a way that's worth retrying."""
+        priority = _priority.get()
+        for attempt in itertools.count():
+            if not self.breaker.allow():
+                self.stats.rejected += 1
+                raise UpstreamUnavailable("Battle.net isn't answering right now, try again in a bit.")
+
+            await self._acquire(priority)
+            self.stats.requests += 1
+            try:
+                result = await request()
+            except Exception as error:
+                if not is_retryable(error):
+                    # The upstream answered, even if it was with a 404, so it's healthy
+                    self.breaker.record_success()
+                    raise
+
+                delay = retry_after(error)
+                if getattr(error, "status", None) == 429:
+                    self.stats.throttled += 1
+                    self._pause(delay or self.backoff)
+                else:
+                    self.stats.failures += 1
+                    self.breaker.record_failure()
+
+                if attempt >= self.max_retries:
+                    raise UpstreamUnavailable("Battle.net isn't answering right now, try again in a bit.") from error
+
+                self.stats.retries += 1
+                await asyncio.sleep(delay if delay is not None else self._backoff(attempt))
+            else:
+                self.breaker.record_success()
+                return result
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter, so retries from a burst of failures don't all land at once."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _pause(self, seconds: float) -> None:
+        """Hold every request back for a while, e.g. after being told we're going too fast."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _delay(self) -> float:
+        """How long until a request may go, as far as the quotas and any pause are concerned."""
+        return max(self._paused_until - time.monotonic(), *(bucket.delay() for bucket in self.buckets))
+
+    def _take(self) -> None:
+        for bucket in self.buckets:
+            bucket.try_acquire()
+
+    async def _acquire(self, priority: Priority) -> None:
+        """Wait for our turn, and for every quota to allow another request."""
+        if not self._waiting and self._delay() <= 0:
+            self._take()
+            return
+
+        self.stats.queued += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._order), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self) -> None:
+        """Hand out turns to waiting requests, most important and then oldest first, as the quotas allow."""
+        while self._waiting:
+            # Skip anyone who gave up waiting
+            if self._waiting[0][2].done():
+                heapq.heappop(self._waiting)
+                continue
+
+            delay = self._delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            self._take()
+            heapq.heappop(self._waiting)[2].set_result(None)
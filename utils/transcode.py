@@ -0,0 +1,89 @@
+"""
+Shrinks images before we upload them to Discord.
+
+Decoding and encoding images is slow and holds on to the GIL, so like `utils/party.py`,
+everything here takes and returns plain bytes, and is meant to run in a worker process.
+"""
+import io
+
+from PIL import Image, features
+
+# Lossy qualities to try, best first, before giving up and shrinking the image further
+QUALITIES = (85, 75, 65, 50)
+SHRINK_STEP = 0.75
+MIN_SIDE = 256
+
+# What Pillow raises for bytes it can't read as an image, e.g. an HTML error page or a truncated download
+DECODE_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+
+SIGNATURES = (
+    (b"\x89PNG", "png"),
+    (b"\xff\xd8", "jpg"),
+    (b"GIF8", "gif"),
+)
+
+
+def image_extension(data: bytes) -> str:
+    """Guess an image's file extension from its first few bytes, defaulting to png."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    for signature, extension in SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    return "png"
+
+
+def _has_alpha(image: Image.Image) -> bool:
+    return image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+
+
+def _encode(image: Image.Image, quality: int | None) -> bytes:
+    """Encode as WebP if Pillow can, otherwise as a PNG if there's transparency to keep, or a JPEG if there isn't."""
+    buffer = io.BytesIO()
+    if features.check("webp"):
+        # Method 2 is about a third quicker than the default, for files within a few percent of the size
+        image.save(buffer, "WEBP", quality=quality, method=2)
+    elif image.mode == "RGBA":
+        image.save(buffer, "PNG", optimize=True)
+    else:
+        image.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def transcode(data: bytes, max_side: int, budget: int, passthrough_below: int = 0) -> bytes:
+    """
+    Shrink an image to fit within `max_side` pixels on its longest side, and `budget` bytes.
+
+    Images that are already smaller than `passthrough_below` bytes, and small enough,
+    are returned as they are. Everything else is re-encoded, at lower and lower quality,
+    and then smaller and smaller sizes, until it fits the budget. If it never does, the
+    smallest attempt is returned anyway.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        fits = max(original.size) <= max_side
+        if fits and len(data) <= passthrough_below:
+            return data
+
+        image = original.convert("RGBA" if _has_alpha(original) else "RGB")
+
+    if not fits:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    # Only WebP and JPEG have a quality to turn down
+    lossy = features.check("webp") or image.mode == "RGB"
+    while True:
+        for quality in QUALITIES if lossy else (None,):
+            encoded = _encode(image, quality)
+            if len(encoded) <= budget:
+                break
+        else:
+            if max(image.size) * SHRINK_STEP >= MIN_SIDE:
+                width, height = image.size
+                image = image.resize((round(width * SHRINK_STEP), round(height * SHRINK_STEP)), Image.LANCZOS)
+                continue
+        break
+
+    # Re-encoding something that was already small can make it bigger
+    if fits and len(data) <= min(len(encoded), budget):
+        return data
+    return encoded
@@ -0,0 +1,435 @@
+"""
+The text transformation behind `!uwu`, shared by every cog that wants to uwuify something.
+
+Use `get_transformer(bot)` rather than building an `UwuTransformer` yourself, so the
+whole bot shares one set of compiled patterns and one emoji index.
+"""
+import re
+import typing as t
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import partial
+
+from discord.ext.commands import Bot
+
+from utils.rng import RandomStream
+
+WORD_REPLACE = {
+    "small": "smol",
+    "cute": "kawaii~", 
+    "fluff": "floof",
+    "love": "luv",
+    "stupid": "baka",
+    "idiot": "baka",
+    "what": "nani",
+    "meow": "nya~",
+    "roar": "rawrr~",
+}
+
+EMOJIS = [
+    "rawr x3",
+    "OwO",
+    "UwU",
+    "o.O",
+    "-.-",
+    ">w<",
+    ">~<",
+    ">///<",
+    "σωσ",
+    "òωó",
+    "ʘwʘ",
+    ":3",
+    "XD",
+    "nyaa~~",
+    "mya",
+    ">_<",
+    "rawr",
+    "uwu",
+    "^^",
+    "^^;;",
+]
+
+REGEX_WORD_REPLACE = re.compile(r"(?<!w)[lr](?!w)")
+
+REGEX_PUNCTUATION = re.compile(r"[.!?\r\n\t]")
+
+REGEX_STUTTER = re.compile(r"(\s)([a-zA-Z])")
+SUBSTITUTE_STUTTER = r"\g<1>\g<2>-\g<2>"
+
+REGEX_NYA = re.compile(r"n([aeou][^aeiou])")
+SUBSTITUTE_NYA = r"ny\1"
+
+REGEX_EMOJI = re.compile(r"<(a)?:(\w+?):(\d{15,21}?)>", re.ASCII)
+
+# Every character the fused pass needs to look at, one character per match:
+#   an 'n' that REGEX_NYA would add a 'y' after,
+#   an 'l' or 'r' that REGEX_WORD_REPLACE would turn into a 'w',
+#   whitespace that REGEX_STUTTER might stutter the next letter after,
+#   or a character that REGEX_PUNCTUATION might turn into an emoticon.
+# Each branch starts with a plain character set, which lets the regex engine skip
+# quickly over everything else.
+REGEX_FUSED = re.compile(r"n(?=[aeou][^aeiou\x01])|[lr](?<!w[lr])(?!w)|\s(?=[a-zA-Z])|[.!?\r\n\t]")
+PUNCTUATION_MARKER = "\x00"
+
+# `uwuify_many` scans several strings at once, joined by this separator. REGEX_FUSED
+# won't look past it when deciding whether to nyaify, just like it wouldn't past the
+# end of a single string, and the extra branch here marks where each string ends.
+SEGMENT_SEPARATOR = "\x01"
+REGEX_FUSED_SEGMENTS = re.compile(REGEX_FUSED.pattern + r"|\x01")
+
+
+def trie_pattern(words: t.Iterable[str]) -> str:
+    """
+    Build a regex that matches any of `words`, preferring the longest one.
+
+    The words are arranged as a trie, e.g. "love", "lovely" and "luv" become
+    `l(?:ove(?:ly)?|uv)`, so matching only ever has to look at one branch per
+    character, no matter how many words there are.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for character in word:
+            node = node.setdefault(character, {})
+        node[""] = {}  # Marks the end of a word
+
+    def build(node: dict) -> str:
+        branches = [re.escape(character) + build(child) for character, child in sorted(node.items()) if character]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # A word may end here, but we'd rather carry on and match a longer one
+        return f"(?:{pattern})?" if "" in node else pattern
+
+    return build(trie)
+
+
+@dataclass(frozen=True, eq=True)
+class Emoji:
+    """Data class for an Emoji."""
+
+    name: str
+    uid: int
+    animated: bool = False
+
+    def __str__(self):
+        anim_bit = "a" if self.animated else ""
+        return f"<{anim_bit}:{self.name}:{self.uid}>"
+
+    @classmethod
+    def from_match(cls, match: tuple[str, str, str]) -> t.Optional["Emoji"]:
+        """Creates an Emoji from a regex match tuple."""
+        if not match or len(match) != 3 or not match[2].isdecimal():
+            return None
+        return cls(match[1], int(match[2]), match[0] == "a")
+
+
+class EmojiIndex:
+    """
+    The IDs of every custom emoji the bot can display, i.e. every emoji in a server it's in.
+
+    The IDs are kept in a frozenset that is swapped out whenever it's rebuilt, so
+    checking an ID is an O(1) lookup, and is safe to do from any thread.
+    """
+
+    def __init__(self, ids: t.Iterable[int] = ()):
+        self.ids = frozenset(ids)
+
+    def __contains__(self, uid: int) -> bool:
+        return uid in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rebuild(self, bot: Bot) -> None:
+        """Rebuild the index from every emoji in the bot's cache."""
+        self.ids = frozenset(emoji.id for emoji in bot.emojis)
+
+
+class UwuTransformer:
+    """
+    Uwuifies text.
+
+    `uwuify` produces exactly what running each of the stages below one after the
+    other would, but does the nyaify, char replace, stutter and emoji stages in a
+    single scan over the text instead of one scan each. None of those stages change
+    what a later stage would match, so they can all look at the same string.
+
+    A transformer keeps no state between calls, so one instance can be shared by
+    every cog, and called from worker threads as well as the event loop.
+    """
+
+    def __init__(
+        self,
+        emoji_index: EmojiIndex,
+        *,
+        word_replace: dict[str, str] = WORD_REPLACE,
+        whole_words: bool = False,
+    ):
+        """
+        Build the transformer's lookup tables.
+
+        Every key in `word_replace` is compiled into one trie-shaped pattern, so adding
+        more words doesn't add more passes over the text. Longer keys win over shorter
+        ones that start at the same place. With `whole_words`, keys only match whole
+        words, so "love" no longer turns "lovely" into "luvly".
+        """
+        self.emoji_index = emoji_index
+        self.word_replace = {word.lower(): replacement for word, replacement in word_replace.items()}
+        self.whole_words = whole_words
+
+        words = trie_pattern(self.word_replace)
+        if whole_words:
+            words = rf"\b(?:{words})\b"
+        self._word_pattern = re.compile(words) if self.word_replace else None
+
+    def _word_replace(self, input_string: str) -> str:
+        """Replaces words that are keys in the word replacement hash to the values specified."""
+        if self._word_pattern is None:
+            return input_string
+        return self._word_pattern.sub(lambda match: self.word_replace[match.group()], input_string)
+
+    def _char_replace(self, input_string: str) -> str:
+        """Replace certain characters with 'w'."""
+        return REGEX_WORD_REPLACE.sub("w", input_string)
+
+    def _stutter(self, strength: float, input_string: str, rng: RandomStream) -> str:
+        """Adds stuttering to a string."""
+        return REGEX_STUTTER.sub(partial(self._stutter_replace, strength=strength, rng=rng), input_string, 0)
+
+    def _stutter_replace(self, match: re.Match, strength: float, rng: RandomStream) -> str:
+        """Replaces a single character with a stuttered character."""
+        match_string = match.group()
+        if rng.random() < strength:
+            return f"{match_string}-{match_string[-1]}"  # Stutter the last character
+        return match_string
+
+    def _nyaify(self, input_string: str) -> str:
+        """Nyaifies a string by adding a 'y' between an 'n' and a vowel."""
+        return REGEX_NYA.sub(SUBSTITUTE_NYA, input_string, 0)
+
+    def _emoji(self, strength: float, input_string: str, rng: RandomStream) -> str:
+        """Replaces some punctuation with emoticons."""
+        return REGEX_PUNCTUATION.sub(partial(self._emoji_replace, strength=strength, rng=rng), input_string, 0)
+
+    def _emoji_replace(self, match: re.Match, strength: float, rng: RandomStream) -> str:
+        """Replaces a punctuation character with an emoticon."""
+        match_string = match.group()
+        if rng.random() < strength:
+            return f" {rng.choice(EMOJIS)} "
+        return match_string
+
+    def _ext_emoji_replace(self, input_string: str, rng: RandomStream) -> str:
+        """Replaces any emoji the bot cannot send in input_text with a random emoticons."""
+        # Every copy of the same emoji gets the same emoticon
+        replacements: dict[Emoji, str] = {}
+
+        def replace(match: re.Match) -> str:
+            emoji = Emoji.from_match(match.groups())
+            if emoji is None or emoji.uid in self.emoji_index:
+                return match.group()
+            if emoji not in replacements:
+                replacements[emoji] = rng.choice(EMOJIS)
+            return replacements[emoji]
+
+        return REGEX_EMOJI.sub(replace, input_string)
+
+    def uwuify_in_stages(
+        self,
+        input_string: str,
+        *,
+        stutter_strength: float = 0.2,
+        emoji_strength: float = 0.25,
+        rng: RandomStream | None = None,
+    ) -> str:
+        """Uwuify a string by running each stage one after the other. Gives the same result as `uwuify`."""
+        if rng is None:
+            rng = RandomStream()
+
+        input_string = input_string.lower()
+        input_string = self._word_replace(input_string)
+        input_string = self._nyaify(input_string)
+        input_string = self._char_replace(input_string)
+        input_string = self._stutter(stutter_strength, input_string, rng)
+        input_string = self._emoji(emoji_strength, input_string, rng)
+        input_string = self._ext_emoji_replace(input_string, rng)
+        return input_string
+
+    def _replacer(
+        self,
+        input_string: str,
+        stutter_strength: float,
+        punctuation: list[str],
+        rng: RandomStream,
+        end_segment: Callable[[], None] | None = None,
+    ) -> Callable[[re.Match], str]:
+        """
+        Build the callback that the fused scan uses to replace each match in `input_string`.
+
+        Punctuation is replaced with `PUNCTUATION_MARKER` and appended to `punctuation`,
+        to be turned into emoticons later. When scanning several strings at once,
+        `end_segment` is called every time the scan passes a `SEGMENT_SEPARATOR`.
+        """
+        last_nya = -3
+        roll = rng.random
+
+        def stutter(position: int) -> str:
+            """Stutter the letter at `position`, as it'll be after the char replace stage."""
+            letter = input_string[position]
+            if letter in "lr" and input_string[position + 1:position + 2] != "w":
+                letter = "w"
+            return f"{letter}-"
+
+        def replace(match: re.Match) -> str:
+            nonlocal last_nya
+            character = match.group()
+
+            # Spaces before a letter are by far the most common match, so they go first
+            if character == " ":
+                if roll() < stutter_strength:
+                    return f" {stutter(match.end())}"
+                return " "
+
+            if character == "l" or character == "r":
+                return "w"
+
+            if character == "n":
+                # REGEX_NYA consumes the two characters after the 'n', so an 'n'
+                # right after those can't start another match.
+                position = match.start()
+                if position - last_nya == 2:
+                    return "n"
+                last_nya = position
+                return "ny"
+
+            if character in ".!?":
+                punctuation.append(character)
+                return PUNCTUATION_MARKER
+
+            if character == SEGMENT_SEPARATOR:
+                end_segment()
+                return character
+
+            # Some whitespace is punctuation too, but only stutters if a letter follows it
+            position = match.end()
+            if character in "\r\n\t":
+                punctuation.append(character)
+                character = PUNCTUATION_MARKER
+                letter = input_string[position:position + 1]
+                if not (letter.isascii() and letter.isalpha()):
+                    return character
+
+            if roll() < stutter_strength:
+                return f"{character}{stutter(position)}"
+            return character
+
+        return replace
+
+    def _draw_emoticons(self, punctuation: list[str], emoji_strength: float, rng: RandomStream) -> list[str]:
+        """Decide which of the punctuation the fused scan marked gets turned into an emoticon."""
+        return [f" {rng.choice(EMOJIS)} " if rng.random() < emoji_strength else character for character in punctuation]
+
+    def _fill_punctuation(self, output: str, replacements: list[str]) -> str:
+        """Put the (possibly emoticon-ified) punctuation back where the fused scan marked it."""
+        if not replacements:
+            return output
+        pieces = output.split(PUNCTUATION_MARKER)
+        for i, replacement in enumerate(replacements):
+            pieces[i] += replacement
+        return "".join(pieces)
+
+    def uwuify(
+        self,
+        input_string: str,
+        *,
+        stutter_strength: float = 0.2,
+        emoji_strength: float = 0.25,
+        rng: RandomStream | None = None,
+    ) -> str:
+        """
+        Takes a string and returns an uwuified version of it.
+
+        Pass a seeded `rng` to get the same result every time.
+        """
+        if rng is None:
+            rng = RandomStream()
+
+        # We mark punctuation while scanning and fill in the emoticons afterwards,
+        # so we can't fuse the stages if the marker is already in the text.
+        if PUNCTUATION_MARKER in input_string or SEGMENT_SEPARATOR in input_string:
+            return self.uwuify_in_stages(input_string, stutter_strength=stutter_strength, emoji_strength=emoji_strength, rng=rng)
+
+        input_string = self._word_replace(input_string.lower())
+
+        punctuation = []
+        output = REGEX_FUSED.sub(self._replacer(input_string, stutter_strength, punctuation, rng), input_string)
+
+        # The separate stages drew every stutter before any emoticon, so we do
+        # the same, to give exactly the same result for a seeded RNG.
+        output = self._fill_punctuation(output, self._draw_emoticons(punctuation, emoji_strength, rng))
+
+        # Custom emoji can only ever be found if there was a '<' to begin with
+        if "<" in input_string:
+            output = self._ext_emoji_replace(output, rng)
+        return output
+
+    def uwuify_many(
+        self,
+        input_strings: t.Sequence[str],
+        *,
+        stutter_strength: float = 0.2,
+        emoji_strength: float = 0.25,
+        rng: RandomStream | None = None,
+    ) -> list[str]:
+        """
+        Uwuify several strings in a single scan, e.g. every bit of text in an embed.
+
+        Gives exactly what calling `uwuify` on each string in turn would, random draws
+        included. The strings are joined with `SEGMENT_SEPARATOR`, which nothing matches
+        across, and the emoticons for each string are drawn as the scan passes its end.
+        """
+        if rng is None:
+            rng = RandomStream()
+
+        joined = SEGMENT_SEPARATOR.join(input_strings)
+
+        # Custom emoji are replaced once a string is otherwise finished, which can't
+        # happen in the middle of a scan, so strings with any of those go one at a time.
+        if (
+            "<" in joined
+            or PUNCTUATION_MARKER in joined
+            or joined.count(SEGMENT_SEPARATOR) != len(input_strings) - 1
+        ):
+            return [
+                self.uwuify(string, stutter_strength=stutter_strength, emoji_strength=emoji_strength, rng=rng)
+                for string in input_strings
+            ]
+
+        joined = self._word_replace(joined.lower())
+
+        punctuation = []
+        replacements = []
+
+        def end_segment() -> None:
+            replacements.extend(self._draw_emoticons(punctuation, emoji_strength, rng))
+            punctuation.clear()
+
+        replace = self._replacer(joined, stutter_strength, punctuation, rng, end_segment)
+        output = REGEX_FUSED_SEGMENTS.sub(replace, joined)
+        end_segment()
+
+        return self._fill_punctuation(output, replacements).split(SEGMENT_SEPARATOR)
+
+
+def get_transformer(bot: Bot) -> UwuTransformer:
+    """
+    Return the transformer shared by the whole bot, creating it the first time it's asked for.
+
+    It lives on the bot rather than on a cog, so every cog gets the same one, and its
+    patterns and emoji index are only ever built once. If this module has been reloaded
+    since, e.g. to pick up new words, a new one is built from the new tables.
+    """
+    transformer = getattr(bot, "uwu", None)
+    if not isinstance(transformer, UwuTransformer):
+        transformer = bot.uwu = UwuTransformer(EmojiIndex(emoji.id for emoji in bot.emojis))
+    return transformer
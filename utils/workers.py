@@ -0,0 +1,135 @@
+import asyncio
+import concurrent.futures
+import time
+import typing as t
+from collections import Counter
+from collections.abc import Callable, Hashable
+from concurrent.futures import Executor
+from dataclasses import dataclass, asdict
+
+T = t.TypeVar("T")
+
+# Looked up by name when the pool starts, since importing the process pool
+# machinery takes a while and most deployments only ever use threads.
+EXECUTORS = {
+    "thread": "ThreadPoolExecutor",
+    "process": "ProcessPoolExecutor",
+}
+
+
+class WorkerPoolFull(Exception):
+    """Raised when a job is turned away because the pool, or the user's share of it, is full."""
+
+
+@dataclass
+class PoolStats:
+    """Counters describing how busy a worker pool is."""
+
+    inline: int = 0
+    offloaded: int = 0
+    rejected: int = 0
+    queue_depth: int = 0  # Offloaded jobs that are waiting for a worker or running right now
+    max_queue_depth: int = 0
+    inline_seconds: float = 0.0
+    transform_seconds: float = 0.0  # Time offloaded jobs spent running in a worker
+    wait_seconds: float = 0.0  # Time offloaded jobs spent waiting for a worker
+
+    def as_dict(self) -> dict[str, float]:
+        """Return the counters as a plain dict."""
+        return asdict(self)
+
+
+def _timed(func: Callable[..., T], *args: t.Any) -> tuple[T, float]:
+    """Run `func` and return its result along with how long it took. Runs inside the worker."""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+class WorkerPool:
+    """
+    Runs CPU-bound jobs either inline, or in a thread or process pool, depending on their size.
+
+    Jobs smaller than `inline_below` are cheaper to run than to hand off, so they run
+    right away on the event loop. Anything bigger goes to one of `workers` workers.
+    At most `max_queue` jobs may be waiting or running at once, and at most `per_user`
+    of those may belong to the same user. Jobs past either limit are rejected with a
+    `WorkerPoolFull` rather than left to pile up.
+
+    With a process pool, the function and its arguments must be picklable.
+    """
+
+    def __init__(
+        self,
+        *,
+        kind: str = "thread",
+        workers: int = 2,
+        max_queue: int = 32,
+        per_user: int = 2,
+        inline_below: int = 2000,
+    ):
+        if kind not in EXECUTORS:
+            raise ValueError(f"Unknown executor {kind!r}, expected one of {', '.join(EXECUTORS)}.")
+
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.inline_below = inline_below
+        self.stats = PoolStats()
+        self._executor: Executor | None = None
+        self._per_user: Counter[Hashable] = Counter()
+
+    def start(self) -> None:
+        """Start the workers."""
+        if self._executor is None:
+            executor_class = getattr(concurrent.futures, EXECUTORS[self.kind])
+            self._executor = executor_class(max_workers=self.workers)
+
+    def restart(self) -> None:
+        """Start new workers, leaving the old ones to finish the jobs they've already been given."""
+        old_executor, self._executor = self._executor, None
+        self.start()
+        if old_executor is not None:
+            old_executor.shutdown(wait=False)
+
+    def close(self) -> None:
+        """Stop the workers, dropping any jobs that haven't started yet."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, user: Hashable, size: int, func: Callable[..., T], *args: t.Any) -> T:
+        """Run `func(*args)` on behalf of `user`, inline if `size` is small enough, otherwise in a worker."""
+        if size < self.inline_below or self._executor is None:
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self.stats.inline += 1
+                self.stats.inline_seconds += time.perf_counter() - started
+
+        if self.stats.queue_depth >= self.max_queue:
+            self.stats.rejected += 1
+            raise WorkerPoolFull("I'm a bit busy right now, try again in a moment.")
+        if self._per_user[user] >= self.per_user:
+            self.stats.rejected += 1
+            raise WorkerPoolFull("You've already got enough going on, wait for that to finish first.")
+
+        self._per_user[user] += 1
+        self.stats.queue_depth += 1
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, self.stats.queue_depth)
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, elapsed = await loop.run_in_executor(self._executor, _timed, func, *args)
+        finally:
+            self.stats.queue_depth -= 1
+            self._per_user[user] -= 1
+            if not self._per_user[user]:
+                del self._per_user[user]
+
+        self.stats.offloaded += 1
+        self.stats.transform_seconds += elapsed
+        self.stats.wait_seconds += time.perf_counter() - started - elapsed
+        return result